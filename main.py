@@ -1,4 +1,10 @@
 import asyncio
+import contextlib
+import copy
+import functools
+import itertools
+import operator
+import socket
 import astrbot.api.star as star
 import astrbot.api.event.filter as filter
 from astrbot.api.event import AstrMessageEvent, MessageChain
@@ -10,9 +16,260 @@ from astrbot.core.star.filter.command_group import CommandGroupFilter
 from astrbot.core.star.filter.permission import PermissionTypeFilter, PermissionType
 from astrbot.api import sp, logger
 from astrbot.core.config import AstrBotConfig
-from typing import Any, Callable, Dict, List, Optional, Tuple
+from .registry_state import ALTER_CMD_SNAPSHOT_TTL, registry_fingerprint, touch_registry
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
-from .webui import WebUIServer as PermissionWebUIServer
+if TYPE_CHECKING:
+    # Web UI 依赖 uvicorn/quart，仅在实际启动时导入
+    from .webui import WebUIServer as PermissionWebUIServer
+
+
+# /perm help 的帮助文本（MessageChain 可变，只缓存文本）
+_HELP_MSG = """🔐 批量权限管理插件帮助
+
+📋 命令列表：
+
+1️⃣ 查看插件列表
+   /perm list
+   列出所有已启用的插件及其命令数量
+
+2️⃣ 查看插件命令
+   /perm plugin <插件名>
+   列出指定插件的所有命令及其权限状态
+
+3️⃣ 批量设置插件权限
+   /perm set plugin <插件名> <admin/member>
+   批量设置指定插件的所有命令权限
+   
+   示例：
+   /perm set plugin astrbot admin
+   /perm set plugin astrbot member
+
+4️⃣ 设置单个命令权限
+   /perm set command <插件名> <命令名> <admin/member>
+   设置指定插件的单个命令权限
+   
+   示例：
+   /perm set command astrbot help admin
+
+5️⃣ 修改命令名或指令组名
+   /perm name set <插件名> <命令名> <新名称>
+   修改指定命令或指令组的名称
+   
+   示例：
+   /perm name set astrbot help 帮助
+
+6️⃣ 管理命令别名
+   /perm alias add <插件名> <命令名> <别名> - 添加别名
+   /perm alias remove <插件名> <命令名> <别名> - 删除别名
+   /perm alias list <插件名> <命令名> - 查看别名列表
+   
+   示例：
+   /perm alias add astrbot help h
+   /perm alias remove astrbot help h
+   /perm alias list astrbot help
+
+💡 权限说明：
+   - admin: 仅管理员可使用
+   - member: 所有成员可使用（管理员也可用）
+
+📝 注意：
+   - 批量设置会覆盖所有命令的权限配置
+   - 设置后立即生效，无需重启
+"""
+
+
+# 各命令的用法提示与固定错误提示（MessageChain 可变，只缓存文本）
+_USAGE_PLUGIN = (
+    "格式: /perm plugin <插件名>\n"
+    "列出指定插件的所有命令及其权限状态。"
+)
+
+_USAGE_SET_PLUGIN = (
+    "格式: /perm set plugin <插件名> <admin/member>\n"
+    "批量设置指定插件的所有命令权限。\n\n"
+    "示例:\n"
+    "/perm set plugin astrbot admin - 将 astrbot 插件的所有命令设为管理员权限\n"
+    "/perm set plugin astrbot member - 将 astrbot 插件的所有命令设为成员权限"
+)
+
+_USAGE_SET_COMMAND = (
+    "格式: /perm set command <插件名> <命令名> <admin/member>\n"
+    "设置指定插件的单个命令权限。\n\n"
+    "示例:\n"
+    "/perm set command astrbot help admin - 将 astrbot 插件的 help 命令设为管理员权限"
+)
+
+_USAGE_NAME_SET = (
+    "格式: /perm name set <插件名> <命令名> <新名称>\n"
+    "修改指定命令或指令组的名称。\n\n"
+    "示例:\n"
+    "/perm name set astrbot help 帮助 - 将 help 命令改名为 帮助"
+)
+
+_USAGE_ALIAS_ADD = (
+    "格式: /perm alias add <插件名> <命令名> <别名>\n"
+    "为指定命令添加别名。\n\n"
+    "示例:\n"
+    "/perm alias add astrbot help h - 为 help 命令添加别名 h"
+)
+
+_USAGE_ALIAS_REMOVE = (
+    "格式: /perm alias remove <插件名> <命令名> <别名>\n"
+    "删除指定命令的别名。\n\n"
+    "示例:\n"
+    "/perm alias remove astrbot help h - 删除 help 命令的别名 h"
+)
+
+_USAGE_ALIAS_LIST = (
+    "格式: /perm alias list <插件名> <命令名>\n"
+    "查看指定命令的别名列表。\n\n"
+    "示例:\n"
+    "/perm alias list astrbot help - 查看 help 命令的别名列表"
+)
+
+_TIPS_LIST_PLUGINS = (
+    "💡 提示：\n"
+    "/perm plugin <插件名> - 查看插件所有命令\n"
+    "/perm set plugin <插件名> <admin/member> - 批量设置插件所有命令权限\n"
+    "/perm set command <插件名> <命令名> <admin/member> - 设置单个命令权限\n"
+)
+
+_TIPS_PLUGIN_COMMANDS = (
+    "💡 提示：\n"
+    "/perm set plugin <插件名> <admin/member> - 批量设置所有命令权限\n"
+    "/perm set command <插件名> <命令名> <admin/member> - 设置单个命令权限\n"
+    "/perm alias add <插件名> <命令名> <别名> - 添加命令别名\n"
+    "/perm alias remove <插件名> <命令名> <别名> - 删除命令别名\n"
+    "/perm alias list <插件名> <命令名> - 查看命令别名列表\n"
+    "/perm name set <插件名> <命令名> <新名称> - 修改命令名或指令组名\n"
+)
+
+# 配置中的权限值与过滤器权限类型的对应关系
+_PERM_MAP = {"admin": PermissionType.ADMIN, "member": PermissionType.MEMBER}
+
+# 命令列表中各权限状态的图标，未列出的状态（成员、未设置）显示为 🔓
+_PERM_ICON = {"admin": "🔒", "admin (代码中设置)": "🔒"}
+
+_ERR_PERM_TYPE = "权限类型错误，只能是 admin 或 member"
+
+_ERR_CMD_DISABLED = "命令行功能已禁用，请在 Web UI 中管理权限。"
+
+_ERR_WEBUI_DISABLED = "Web UI 功能已禁用，请在插件配置中启用。"
+
+
+# 监控任务出错后的重试等待时间（秒），连续出错时从最小值开始翻倍直到最大值
+_MONITOR_RETRY_MIN = 5
+_MONITOR_RETRY_MAX = 300
+
+
+# 命令列表的排序键：(是否指令组, 命令名)，命令在前、指令组在后
+_COMMAND_ORDER = operator.itemgetter(3, 1)
+
+
+# 过滤器类型 → 在 _scan_filters 结果中的位置（0 命令，1 指令组，2 权限，None 无关类型）
+# 按具体类型查表代替逐个 isinstance，遇到新类型（如子类）时用 issubclass 判断一次后记入表中
+_FILTER_SLOTS: Dict[type, Optional[int]] = {
+    CommandFilter: 0,
+    CommandGroupFilter: 1,
+    PermissionTypeFilter: 2,
+}
+_SLOT_UNKNOWN = -1
+
+
+def _filter_slot(filter_type: type) -> Optional[int]:
+    """计算并缓存不在表中的过滤器类型的位置"""
+    slot = None
+    for index, base in enumerate((CommandFilter, CommandGroupFilter, PermissionTypeFilter)):
+        if issubclass(filter_type, base):
+            slot = index
+            break
+    _FILTER_SLOTS[filter_type] = slot
+    return slot
+
+
+def _scan_filters(
+    handler: StarHandlerMetadata,
+) -> Tuple[Optional[CommandFilter], Optional[CommandGroupFilter], Optional[PermissionTypeFilter]]:
+    """
+    查找 handler 的命令过滤器、指令组过滤器和权限过滤器，结果缓存在 handler 上
+    event_filters 被替换或增删过滤器（如追加权限过滤器）时自动重新查找
+    """
+    event_filters = handler.event_filters
+    key = (id(event_filters), len(event_filters))
+    cached = handler.__dict__.get("_perm_filter_cache")
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    found: List[Any] = [None, None, None]
+    slots_get = _FILTER_SLOTS.get
+    for event_filter in event_filters:
+        filter_type = type(event_filter)
+        slot = slots_get(filter_type, _SLOT_UNKNOWN)
+        if slot == _SLOT_UNKNOWN:
+            slot = _filter_slot(filter_type)
+        if slot is None:
+            continue
+        if slot == 2:
+            if found[2] is None:
+                found[2] = event_filter
+        # 只取第一个命令/指令组过滤器
+        elif found[0] is None and found[1] is None:
+            found[slot] = event_filter
+
+    filters = (found[0], found[1], found[2])
+    handler.__dict__["_perm_filter_cache"] = (key, filters)
+    return filters
+
+
+def _find_command_filters(
+    handler: StarHandlerMetadata,
+) -> Tuple[Optional[CommandFilter], Optional[CommandGroupFilter]]:
+    """获取 handler 的 (命令过滤器, 指令组过滤器)，两者至多一个不为 None"""
+    command_filter, group_filter, _ = _scan_filters(handler)
+    return command_filter, group_filter
+
+
+def _find_permission_filter(handler: StarHandlerMetadata) -> Optional[PermissionTypeFilter]:
+    """获取 handler 的权限过滤器"""
+    return _scan_filters(handler)[2]
+
+
+def _reply(event: AstrMessageEvent, text: str) -> Awaitable[Any]:
+    """以纯文本回复消息，返回 event.send 的协程，由调用方 await"""
+    return event.send(MessageChain().message(text))
+
+
+def _set_permission_filter(handler: StarHandlerMetadata, permission_type: PermissionType):
+    """将 handler 的权限过滤器设为指定类型，没有权限过滤器时追加一个"""
+    permission_filter = _find_permission_filter(handler)
+    if permission_filter:
+        permission_filter.permission_type = permission_type
+    else:
+        handler.event_filters.append(PermissionTypeFilter(permission_type))
+
+
+def _require_enabled(flag: str, message: str) -> Callable[[Callable], Callable]:
+    """
+    生成装饰器：实例的开关属性 flag 为假时直接回复 message，不执行命令
+    需放在注册装饰器下方，使注册的是包装后的函数
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, event: AstrMessageEvent, *args, **kwargs):
+            if not getattr(self, flag):
+                await _reply(event, message)
+                return
+            return await func(self, event, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+_require_command_enabled = _require_enabled("command_enabled", _ERR_CMD_DISABLED)
+_require_webui_enabled = _require_enabled("webui_enabled", _ERR_WEBUI_DISABLED)
 
 
 class PermissionManagerCommands(CommandParserMixin):
@@ -20,368 +277,468 @@ class PermissionManagerCommands(CommandParserMixin):
 
     def __init__(self, context: star.Context):
         self.context = context
+        # 命令列表缓存: (注册表指纹, {插件名: [...]})
+        self._cache: Optional[Tuple[tuple, Dict[str, list]]] = None
+        # 命令查找索引: {(插件名, 命令名): handler}，与命令列表缓存同时重建
+        self._name_index: Dict[Tuple[str, str], StarHandlerMetadata] = {}
+        # handler 索引: {(插件名, handler名): handler}，用于按 alter_cmd 配置定位 handler
+        self._handler_index: Dict[Tuple[str, str], StarHandlerMetadata] = {}
+        # 各插件的 (命令数, 指令组数)，与命令列表缓存同时重建
+        self._plugin_counts: Dict[str, Tuple[int, int]] = {}
+        # alter_cmd 合并写入: 待写入的配置、延迟写入任务
+        self._dirty: Optional[Dict[str, Any]] = None
+        # 最近一次读取/写入的 alter_cmd 快照: (时间, 配置)
+        self._snapshot: Optional[Tuple[float, Dict[str, Any]]] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._batch_depth = 0
+        # 串行化 alter_cmd 的读-改-写，避免并发修改互相覆盖
+        self._cfg_lock = asyncio.Lock()
 
-    def _get_all_commands_by_plugin(self) -> Dict[str, List[Tuple[StarHandlerMetadata, str, str, bool]]]:
+    def _get_all_commands_by_plugin(
+        self,
+        fingerprint: Optional[tuple] = None
+    ) -> Dict[str, List[Tuple[StarHandlerMetadata, str, str, bool]]]:
         """
-        获取所有插件及其命令列表
+        获取所有插件及其命令列表（带缓存，注册表指纹不变时直接返回）
+        fingerprint: 调用方刚计算的注册表指纹，避免重复计算
         返回: {插件名: [(handler, 命令名, 命令类型, 是否是指令组), ...]}
         """
+        if fingerprint is None:
+            fingerprint = registry_fingerprint()
+        if self._cache is not None and self._cache[0] == fingerprint:
+            return self._cache[1]
+
         plugin_commands = {}
+        name_index = {}
+        handler_index = {}
         
+        star_map_get = star_map.get
         for handler in star_handlers_registry:
-            assert isinstance(handler, StarHandlerMetadata)
-            if handler.handler_module_path not in star_map:
-                continue
-            
-            plugin = star_map[handler.handler_module_path]
-            if not plugin.activated:
+            plugin = star_map_get(handler.handler_module_path)
+            if plugin is None or not plugin.activated:
                 continue
             
-            if plugin.name not in plugin_commands:
-                plugin_commands[plugin.name] = []
+            # 插件没有命令时也要出现在列表中
+            commands = plugin_commands.setdefault(plugin.name, [])
             
             # 检查命令过滤器
-            for event_filter in handler.event_filters:
-                if isinstance(event_filter, CommandFilter):
-                    plugin_commands[plugin.name].append(
-                        (handler, event_filter.command_name, "command", False)
-                    )
-                    break
-                elif isinstance(event_filter, CommandGroupFilter):
-                    plugin_commands[plugin.name].append(
-                        (handler, event_filter.group_name, "command_group", True)
-                    )
-                    break
-        
+            command_filter, group_filter = _find_command_filters(handler)
+            if command_filter:
+                entry = (handler, command_filter.command_name, "command", False)
+            elif group_filter:
+                entry = (handler, group_filter.group_name, "command_group", True)
+            else:
+                continue
+            commands.append(entry)
+            name_index.setdefault((plugin.name, entry[1]), handler)
+            handler_index.setdefault((plugin.name, handler.handler_name), handler)
+
+        # 构建时排序：插件按名称；命令在前、指令组在后，各自按命令名，列表命令直接按顺序输出
+        plugin_commands = {
+            name: sorted(plugin_commands[name], key=_COMMAND_ORDER)
+            for name in sorted(plugin_commands)
+        }
+        plugin_counts = {}
+        for name, commands in plugin_commands.items():
+            group_count = sum(1 for c in commands if c[3])
+            plugin_counts[name] = (len(commands) - group_count, group_count)
+
+        self._cache = (fingerprint, plugin_commands)
+        self._name_index = name_index
+        self._handler_index = handler_index
+        self._plugin_counts = plugin_counts
         return plugin_commands
 
-    async def _get_command_permission(self, plugin_name: str, handler_name: str) -> Optional[str]:
-        """获取命令的当前权限配置"""
+    def get_handler_index(self, fingerprint: Optional[tuple] = None) -> Dict[Tuple[str, str], StarHandlerMetadata]:
+        """获取 {(插件名, handler名): handler} 索引，只包含命令和指令组"""
+        self._get_all_commands_by_plugin(fingerprint)
+        return self._handler_index
+
+    async def _load_alter_cmd(self) -> Dict[str, Any]:
+        """从存储中读取 alter_cmd 配置，并将所有 aliases 统一为列表"""
         alter_cmd_cfg = await sp.global_get("alter_cmd", {})
+        for plugin_cfg in alter_cmd_cfg.values():
+            for cmd_cfg in plugin_cfg.values():
+                if "aliases" in cmd_cfg:
+                    aliases = cmd_cfg["aliases"]
+                    if not isinstance(aliases, list):
+                        cmd_cfg["aliases"] = list(aliases) if aliases else []
+        return alter_cmd_cfg
+
+    async def _get_alter_cmd(self) -> Dict[str, Any]:
+        """
+        读取 alter_cmd 配置，存在尚未写入的修改时直接返回待写入的配置
+        快照有效期内直接复用，不再访问存储
+        """
+        if self._dirty is not None:
+            return self._dirty
+        now = asyncio.get_running_loop().time()
+        if self._snapshot is not None and now - self._snapshot[0] < ALTER_CMD_SNAPSHOT_TTL:
+            return self._snapshot[1]
+        alter_cmd_cfg = await self._load_alter_cmd()
+        self._snapshot = (now, alter_cmd_cfg)
+        return alter_cmd_cfg
+
+    async def _get_write_base(self) -> Dict[str, Any]:
+        """
+        供写入路径读取 alter_cmd：存在尚未写入的修改时返回待写入的配置，否则从存储重新读取
+        不使用读取快照，避免以过期配置为基础写入，覆盖 Web UI 或 /alter_cmd 刚做的修改
+        """
+        if self._dirty is not None:
+            return self._dirty
+        return await self._load_alter_cmd()
+
+    async def _get_pending_alter_cmd(self, cfg: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        获取待写入的 alter_cmd 配置，首次修改时从存储中重新加载
+        cfg: 调用方在同一次持有 _cfg_lock 期间通过 _get_write_base 读取的配置，
+        没有待写入的修改时直接复用，避免重复读取；不能传入读取快照或锁外读取的配置
+        """
+        if self._dirty is None:
+            self._dirty = cfg if cfg is not None else await self._load_alter_cmd()
+        return self._dirty
+
+    def _schedule_flush(self):
+        """安排一次合并写入，批量操作期间由 _batch 统一写入"""
+        if self._batch_depth:
+            return
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_after(0.05))
+
+    async def _flush_after(self, delay: float):
+        await asyncio.sleep(delay)
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"写入 alter_cmd 配置时出错: {e}", exc_info=True)
+
+    async def flush(self):
+        """将待写入的 alter_cmd 配置一次性写入存储"""
+        async with self._cfg_lock:
+            alter_cmd_cfg, self._dirty = self._dirty, None
+            if alter_cmd_cfg is None:
+                return
+            try:
+                await sp.global_put("alter_cmd", alter_cmd_cfg)
+            except Exception:
+                # 写入失败时保留修改，等待下次写入
+                self._dirty = alter_cmd_cfg
+                raise
+            self._snapshot = (asyncio.get_running_loop().time(), alter_cmd_cfg)
+
+    @contextlib.asynccontextmanager
+    async def _batch(self):
+        """批量修改期间暂停自动写入，结束时只写入一次"""
+        self._batch_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                await self.flush()
+
+    async def _get_command_permission(
+        self,
+        plugin_name: str,
+        handler_name: str,
+        cfg: Optional[Dict[str, Any]] = None
+    ) -> Optional[str]:
+        """获取命令的当前权限配置"""
+        alter_cmd_cfg = cfg if cfg is not None else await self._get_alter_cmd()
         plugin_cfg = alter_cmd_cfg.get(plugin_name, {})
         cmd_cfg = plugin_cfg.get(handler_name, {})
         return cmd_cfg.get("permission")
     
-    async def _get_command_aliases(self, plugin_name: str, handler_name: str) -> List[str]:
+    async def _get_command_aliases(
+        self,
+        plugin_name: str,
+        handler_name: str,
+        cfg: Optional[Dict[str, Any]] = None
+    ) -> List[str]:
         """获取命令的别名列表"""
-        alter_cmd_cfg = await sp.global_get("alter_cmd", {})
+        alter_cmd_cfg = cfg if cfg is not None else await self._get_alter_cmd()
         plugin_cfg = alter_cmd_cfg.get(plugin_name, {})
         cmd_cfg = plugin_cfg.get(handler_name, {})
-        aliases = cmd_cfg.get("aliases", [])
-        # 确保返回的是列表
-        if aliases is None:
-            return []
-        if not isinstance(aliases, list):
-            return list(aliases) if aliases else []
+        return cmd_cfg.get("aliases", [])
+    
+    async def _resolve_aliases(
+        self,
+        plugin_name: str,
+        handler: StarHandlerMetadata,
+        cfg: Optional[Dict[str, Any]] = None
+    ) -> List[str]:
+        """获取命令当前生效的别名：优先使用配置，配置中没有时取过滤器上代码设置的别名"""
+        aliases = await self._get_command_aliases(plugin_name, handler.handler_name, cfg)
+        if not aliases:
+            # 尝试从过滤器中获取
+            command_filter, group_filter = _find_command_filters(handler)
+            event_filter = command_filter or group_filter
+            if event_filter and event_filter.alias:
+                aliases = list(event_filter.alias)
         return aliases
     
-    async def _set_command_aliases(
+    async def _update_command_aliases(
         self,
         plugin_name: str,
-        handler_name: str,
-        aliases: List[str],
-        handler: Optional[StarHandlerMetadata] = None
-    ):
-        """设置命令别名"""
-        alter_cmd_cfg = await sp.global_get("alter_cmd", {})
-        plugin_cfg = alter_cmd_cfg.get(plugin_name, {})
-        cmd_cfg = plugin_cfg.get(handler_name, {})
-        cmd_cfg["aliases"] = aliases
-        plugin_cfg[handler_name] = cmd_cfg
-        alter_cmd_cfg[plugin_name] = plugin_cfg
-        await sp.global_put("alter_cmd", alter_cmd_cfg)
-        
-        # 如果提供了handler，立即更新过滤器
-        if handler:
-            for event_filter in handler.event_filters:
-                if isinstance(event_filter, CommandFilter):
-                    # 更新别名集合
-                    event_filter.alias = set(aliases)
-                    # 清除缓存，强制重新计算完整命令名
-                    event_filter._cmpl_cmd_names = None
-                    break
-                elif isinstance(event_filter, CommandGroupFilter):
-                    # 更新别名集合
-                    event_filter.alias = set(aliases)
-                    # 清除缓存
-                    event_filter._cmpl_cmd_names = None
-                    break
+        handler: StarHandlerMetadata,
+        update: Callable[[List[str]], Optional[List[str]]]
+    ) -> bool:
+        """
+        修改命令别名：在锁内读取最新配置中的别名列表，交给 update 计算新列表并写入
+        读取与写入都在锁内，不会与正在进行的 flush 交错而以写入前的配置为基础
+        update 返回 None 表示无需修改；返回是否修改了别名
+        """
+        async with self._cfg_lock:
+            alter_cmd_cfg = await self._get_write_base()
+            aliases = update(await self._resolve_aliases(plugin_name, handler, alter_cmd_cfg))
+            if aliases is None:
+                return False
+            alter_cmd_cfg = await self._get_pending_alter_cmd(alter_cmd_cfg)
+            plugin_cfg = alter_cmd_cfg.get(plugin_name, {})
+            cmd_cfg = plugin_cfg.get(handler.handler_name, {})
+            cmd_cfg["aliases"] = aliases
+            plugin_cfg[handler.handler_name] = cmd_cfg
+            alter_cmd_cfg[plugin_name] = plugin_cfg
+        self._schedule_flush()
+        
+        # 立即更新过滤器
+        command_filter, group_filter = _find_command_filters(handler)
+        event_filter = command_filter or group_filter
+        if event_filter:
+            # 更新别名集合
+            event_filter.alias = set(aliases)
+            # 清除缓存，强制重新计算完整命令名
+            event_filter._cmpl_cmd_names = None
+        return True
     
     async def _set_command_name(
         self,
         plugin_name: str,
         handler_name: str,
         new_name: str,
-        handler: Optional[StarHandlerMetadata] = None
+        handler: Optional[StarHandlerMetadata] = None,
+        cfg: Optional[Dict[str, Any]] = None
     ):
         """设置命令名（或指令组名）"""
-        alter_cmd_cfg = await sp.global_get("alter_cmd", {})
-        plugin_cfg = alter_cmd_cfg.get(plugin_name, {})
-        cmd_cfg = plugin_cfg.get(handler_name, {})
-        cmd_cfg["name"] = new_name
-        plugin_cfg[handler_name] = cmd_cfg
-        alter_cmd_cfg[plugin_name] = plugin_cfg
-        await sp.global_put("alter_cmd", alter_cmd_cfg)
+        async with self._cfg_lock:
+            alter_cmd_cfg = await self._get_pending_alter_cmd(cfg)
+            plugin_cfg = alter_cmd_cfg.get(plugin_name, {})
+            cmd_cfg = plugin_cfg.get(handler_name, {})
+            cmd_cfg["name"] = new_name
+            plugin_cfg[handler_name] = cmd_cfg
+            alter_cmd_cfg[plugin_name] = plugin_cfg
+        self._schedule_flush()
         
         # 如果提供了handler，立即更新过滤器
         if handler:
-            for event_filter in handler.event_filters:
-                if isinstance(event_filter, CommandFilter):
-                    # 更新命令名
-                    event_filter.command_name = new_name
-                    # 清除缓存，强制重新计算完整命令名
-                    event_filter._cmpl_cmd_names = None
-                    break
-                elif isinstance(event_filter, CommandGroupFilter):
-                    # 更新指令组名
-                    event_filter.group_name = new_name
-                    # 清除缓存
-                    event_filter._cmpl_cmd_names = None
-                    break
+            command_filter, group_filter = _find_command_filters(handler)
+            if command_filter:
+                # 更新命令名
+                command_filter.command_name = new_name
+                # 清除缓存，强制重新计算完整命令名
+                command_filter._cmpl_cmd_names = None
+            elif group_filter:
+                # 更新指令组名
+                group_filter.group_name = new_name
+                # 清除缓存
+                group_filter._cmpl_cmd_names = None
+            # 命令名是命令列表缓存的一部分
+            touch_registry()
 
     async def _set_command_permission(
         self, 
         plugin_name: str, 
         handler_name: str, 
         permission: str,
-        handler: Optional[StarHandlerMetadata] = None
+        handler: Optional[StarHandlerMetadata] = None,
+        cfg: Optional[Dict[str, Any]] = None
     ):
         """设置命令权限"""
-        alter_cmd_cfg = await sp.global_get("alter_cmd", {})
-        plugin_cfg = alter_cmd_cfg.get(plugin_name, {})
-        cmd_cfg = plugin_cfg.get(handler_name, {})
-        cmd_cfg["permission"] = permission
-        plugin_cfg[handler_name] = cmd_cfg
-        alter_cmd_cfg[plugin_name] = plugin_cfg
-        await sp.global_put("alter_cmd", alter_cmd_cfg)
+        async with self._cfg_lock:
+            alter_cmd_cfg = await self._get_pending_alter_cmd(cfg)
+            plugin_cfg = alter_cmd_cfg.get(plugin_name, {})
+            cmd_cfg = plugin_cfg.get(handler_name, {})
+            cmd_cfg["permission"] = permission
+            plugin_cfg[handler_name] = cmd_cfg
+            alter_cmd_cfg[plugin_name] = plugin_cfg
+        self._schedule_flush()
         
         # 如果提供了handler，立即更新过滤器
         if handler:
-            found_permission_filter = False
-            for event_filter in handler.event_filters:
-                if isinstance(event_filter, PermissionTypeFilter):
-                    if permission == "admin":
-                        event_filter.permission_type = PermissionType.ADMIN
-                    else:
-                        event_filter.permission_type = PermissionType.MEMBER
-                    found_permission_filter = True
-                    break
-            
-            if not found_permission_filter:
-                handler.event_filters.append(
-                    PermissionTypeFilter(
-                        PermissionType.ADMIN if permission == "admin" else PermissionType.MEMBER
-                    )
-                )
+            _set_permission_filter(handler, _PERM_MAP[permission])
 
     async def _batch_set_plugin_permission(
         self, 
         plugin_name: str, 
         permission: str,
-        command_type: Optional[str] = None
+        command_type: Optional[str] = None,
+        commands: Optional[List[Tuple[StarHandlerMetadata, str, str, bool]]] = None
     ) -> Tuple[int, int]:
         """
         批量设置插件所有命令的权限
+        commands: 调用方已取得的该插件命令列表，避免重复查找
         返回: (成功数量, 总数量)
         """
-        plugin_commands = self._get_all_commands_by_plugin()
-        
-        if plugin_name not in plugin_commands:
+        if commands is None:
+            commands = self._get_all_commands_by_plugin().get(plugin_name)
+            if commands is None:
+                return (0, 0)
+        
+        # 如果指定了命令类型，只处理该类型
+        handlers = [
+            handler for handler, _, cmd_type, _ in commands
+            if not command_type or cmd_type == command_type
+        ]
+        if not handlers:
             return (0, 0)
         
-        success_count = 0
-        total_count = 0
-        
-        for handler, cmd_name, cmd_type, is_group in plugin_commands[plugin_name]:
-            # 如果指定了命令类型，只处理该类型
-            if command_type and cmd_type != command_type:
-                continue
+        async with self._batch():
+            # 所有命令的配置在一次加锁中写入
+            async with self._cfg_lock:
+                alter_cmd_cfg = await self._get_pending_alter_cmd()
+                plugin_cfg = alter_cmd_cfg.get(plugin_name, {})
+                for handler in handlers:
+                    plugin_cfg.setdefault(handler.handler_name, {})["permission"] = permission
+                alter_cmd_cfg[plugin_name] = plugin_cfg
             
-            total_count += 1
-            await self._set_command_permission(
-                plugin_name, 
-                handler.handler_name, 
-                permission,
-                handler
-            )
-            success_count += 1
+            permission_type = _PERM_MAP[permission]
+            for handler in handlers:
+                _set_permission_filter(handler, permission_type)
+        
+        return (len(handlers), len(handlers))
+
+    async def _resolve_command(
+        self,
+        event: AstrMessageEvent,
+        plugin_name: str,
+        command_name: str
+    ) -> Optional[StarHandlerMetadata]:
+        """按插件名和命令名查找 handler，找不到时发送错误提示并返回 None"""
+        plugin_commands = self._get_all_commands_by_plugin()
+        if plugin_name not in plugin_commands:
+            await _reply(event, f"未找到插件: {plugin_name}")
+            return None
         
-        return (success_count, total_count)
+        found_handler = self._name_index.get((plugin_name, command_name))
+        if not found_handler:
+            await _reply(event, f"未找到命令: {command_name}")
+            return None
+        return found_handler
 
     async def list_plugins(self, event: AstrMessageEvent):
         """列出所有插件及其命令数量"""
         plugin_commands = self._get_all_commands_by_plugin()
         
         if not plugin_commands:
-            await event.send(MessageChain().message("没有找到任何已启用的插件。"))
+            await _reply(event, "没有找到任何已启用的插件。")
             return
         
-        msg = "📋 已启用插件列表：\n\n"
-        for plugin_name, commands in sorted(plugin_commands.items()):
-            command_count = len([c for c in commands if c[2] == "command"])
-            group_count = len([c for c in commands if c[3]])
-            msg += f"🔹 {plugin_name}\n"
-            msg += f"   命令数: {command_count}, 指令组数: {group_count}\n"
-            msg += f"   使用 /perm plugin {plugin_name} 查看详细命令列表\n\n"
+        parts = ["📋 已启用插件列表：\n\n"]
+        for plugin_name in plugin_commands:
+            command_count, group_count = self._plugin_counts[plugin_name]
+            parts.append(
+                f"🔹 {plugin_name}\n"
+                f"   命令数: {command_count}, 指令组数: {group_count}\n"
+                f"   使用 /perm plugin {plugin_name} 查看详细命令列表\n\n"
+            )
         
-        msg += "💡 提示：\n"
-        msg += "/perm plugin <插件名> - 查看插件所有命令\n"
-        msg += "/perm set plugin <插件名> <admin/member> - 批量设置插件所有命令权限\n"
-        msg += "/perm set command <插件名> <命令名> <admin/member> - 设置单个命令权限\n"
+        parts.append(_TIPS_LIST_PLUGINS)
         
-        await event.send(MessageChain().message(msg))
+        await _reply(event, "".join(parts))
 
     async def list_plugin_commands(self, event: AstrMessageEvent, plugin_name: str = ""):
         """列出指定插件的所有命令"""
         if not plugin_name:
-            await event.send(MessageChain().message(
-                "格式: /perm plugin <插件名>\n"
-                "列出指定插件的所有命令及其权限状态。"
-            ))
+            await _reply(event, _USAGE_PLUGIN)
             return
         
         plugin_commands = self._get_all_commands_by_plugin()
         
         if plugin_name not in plugin_commands:
-            await event.send(MessageChain().message(f"未找到插件: {plugin_name}"))
+            await _reply(event, f"未找到插件: {plugin_name}")
             return
         
         commands = plugin_commands[plugin_name]
-        alter_cmd_cfg = await sp.global_get("alter_cmd", {})
+        alter_cmd_cfg = await self._get_alter_cmd()
         plugin_cfg = alter_cmd_cfg.get(plugin_name, {})
         
-        msg = f"📋 插件 {plugin_name} 的命令列表：\n\n"
-        
-        # 按类型分组
-        command_list = []
-        group_list = []
-        
-        for handler, cmd_name, cmd_type, is_group in commands:
-            current_perm = plugin_cfg.get(handler.handler_name, {}).get("permission", "未设置")
-            if current_perm == "未设置":
-                # 检查handler中是否有权限过滤器
-                for event_filter in handler.event_filters:
-                    if isinstance(event_filter, PermissionTypeFilter):
-                        if event_filter.permission_type == PermissionType.ADMIN:
+        parts = [f"📋 插件 {plugin_name} 的命令列表：\n\n"]
+        
+        # 命令列表已按（是否指令组, 命令名）排序，命令在前、指令组在后，按类型连续分段输出
+        for is_group, section in itertools.groupby(commands, key=lambda c: c[3]):
+            parts.append("📁 指令组：\n" if is_group else "📌 命令：\n")
+            for handler, cmd_name, cmd_type, _ in section:
+                cmd_cfg = plugin_cfg.get(handler.handler_name, {})
+                # 权限和别名的回退值都来自过滤器，一次取出
+                command_filter, group_filter, permission_filter = _scan_filters(handler)
+                current_perm = cmd_cfg.get("permission", "未设置")
+                if current_perm == "未设置":
+                    # 检查handler中是否有权限过滤器
+                    if permission_filter:
+                        if permission_filter.permission_type == PermissionType.ADMIN:
                             current_perm = "admin (代码中设置)"
                         else:
                             current_perm = "member (代码中设置)"
-                        break
-            
-            # 获取别名信息
-            aliases = plugin_cfg.get(handler.handler_name, {}).get("aliases", [])
-            # 如果配置中没有别名，尝试从过滤器中获取
-            if not aliases:
-                for event_filter in handler.event_filters:
-                    if isinstance(event_filter, (CommandFilter, CommandGroupFilter)):
-                        if event_filter.alias:
-                            aliases = list(event_filter.alias)
-                        break
-            
-            info = {
-                "name": cmd_name,
-                "type": cmd_type,
-                "handler": handler.handler_name,
-                "permission": current_perm,
-                "aliases": aliases,
-                "is_group": is_group
-            }
-            
-            if is_group:
-                group_list.append(info)
-            else:
-                command_list.append(info)
-        
-        if command_list:
-            msg += "📌 命令：\n"
-            for cmd in sorted(command_list, key=lambda x: x["name"]):
-                perm_icon = "🔒" if cmd["permission"] == "admin" or "admin" in str(cmd["permission"]) else "🔓"
-                alias_str = ""
-                if cmd.get("aliases"):
-                    alias_str = f" (别名: {', '.join(cmd['aliases'])})"
-                msg += f"  {perm_icon} {cmd['name']}{alias_str} - 权限: {cmd['permission']}\n"
-            msg += "\n"
-        
-        if group_list:
-            msg += "📁 指令组：\n"
-            for group in sorted(group_list, key=lambda x: x["name"]):
-                perm_icon = "🔒" if group["permission"] == "admin" or "admin" in str(group["permission"]) else "🔓"
-                alias_str = ""
-                if group.get("aliases"):
-                    alias_str = f" (别名: {', '.join(group['aliases'])})"
-                msg += f"  {perm_icon} {group['name']}{alias_str} - 权限: {group['permission']}\n"
-            msg += "\n"
+                
+                # 获取别名信息
+                aliases = cmd_cfg.get("aliases", [])
+                # 如果配置中没有别名，尝试从过滤器中获取
+                if not aliases:
+                    event_filter = command_filter or group_filter
+                    if event_filter and event_filter.alias:
+                        aliases = list(event_filter.alias)
+                
+                perm_icon = _PERM_ICON.get(current_perm, "🔓")
+                # 每行只格式化一次，不单独构建别名片段
+                if aliases:
+                    parts.append(f"  {perm_icon} {cmd_name} (别名: {', '.join(aliases)}) - 权限: {current_perm}\n")
+                else:
+                    parts.append(f"  {perm_icon} {cmd_name} - 权限: {current_perm}\n")
+            parts.append("\n")
         
-        msg += "💡 提示：\n"
-        msg += "/perm set plugin <插件名> <admin/member> - 批量设置所有命令权限\n"
-        msg += "/perm set command <插件名> <命令名> <admin/member> - 设置单个命令权限\n"
-        msg += "/perm alias add <插件名> <命令名> <别名> - 添加命令别名\n"
-        msg += "/perm alias remove <插件名> <命令名> <别名> - 删除命令别名\n"
-        msg += "/perm alias list <插件名> <命令名> - 查看命令别名列表\n"
-        msg += "/perm name set <插件名> <命令名> <新名称> - 修改命令名或指令组名\n"
+        parts.append(_TIPS_PLUGIN_COMMANDS)
         
-        await event.send(MessageChain().message(msg))
+        await _reply(event, "".join(parts))
 
     async def batch_set_plugin(self, event: AstrMessageEvent, plugin_name: str = "", permission: str = ""):
         """批量设置插件所有命令的权限"""
         if not plugin_name or not permission:
-            await event.send(MessageChain().message(
-                "格式: /perm set plugin <插件名> <admin/member>\n"
-                "批量设置指定插件的所有命令权限。\n\n"
-                "示例:\n"
-                "/perm set plugin astrbot admin - 将 astrbot 插件的所有命令设为管理员权限\n"
-                "/perm set plugin astrbot member - 将 astrbot 插件的所有命令设为成员权限"
-            ))
+            await _reply(event, _USAGE_SET_PLUGIN)
             return
         
-        if permission not in ["admin", "member"]:
-            await event.send(MessageChain().message("权限类型错误，只能是 admin 或 member"))
+        if permission not in _PERM_MAP:
+            await _reply(event, _ERR_PERM_TYPE)
             return
         
         plugin_commands = self._get_all_commands_by_plugin()
         if plugin_name not in plugin_commands:
-            await event.send(MessageChain().message(f"未找到插件: {plugin_name}"))
+            await _reply(event, f"未找到插件: {plugin_name}")
             return
         
         success_count, total_count = await self._batch_set_plugin_permission(
             plugin_name, 
-            permission
+            permission,
+            commands=plugin_commands[plugin_name]
         )
         
         perm_text = "管理员权限" if permission == "admin" else "成员权限"
-        await event.send(MessageChain().message(
+        await _reply(
+            event,
             f"✅ 成功设置 {plugin_name} 插件的 {success_count}/{total_count} 个命令为 {perm_text}。"
-        ))
+        )
 
     async def set_command(self, event: AstrMessageEvent, plugin_name: str = "", command_name: str = "", permission: str = ""):
         """设置单个命令的权限"""
         if not plugin_name or not command_name or not permission:
-            await event.send(MessageChain().message(
-                "格式: /perm set command <插件名> <命令名> <admin/member>\n"
-                "设置指定插件的单个命令权限。\n\n"
-                "示例:\n"
-                "/perm set command astrbot help admin - 将 astrbot 插件的 help 命令设为管理员权限"
-            ))
+            await _reply(event, _USAGE_SET_COMMAND)
             return
         
-        if permission not in ["admin", "member"]:
-            await event.send(MessageChain().message("权限类型错误，只能是 admin 或 member"))
+        if permission not in _PERM_MAP:
+            await _reply(event, _ERR_PERM_TYPE)
             return
         
-        plugin_commands = self._get_all_commands_by_plugin()
-        if plugin_name not in plugin_commands:
-            await event.send(MessageChain().message(f"未找到插件: {plugin_name}"))
-            return
-        
-        # 查找命令
-        found_handler = None
-        for handler, cmd_name, cmd_type, is_group in plugin_commands[plugin_name]:
-            if cmd_name == command_name:
-                found_handler = handler
-                break
-        
-        if not found_handler:
-            await event.send(MessageChain().message(f"未找到命令: {command_name}"))
+        found_handler = await self._resolve_command(event, plugin_name, command_name)
+        if found_handler is None:
             return
         
         await self._set_command_permission(
@@ -392,92 +749,26 @@ class PermissionManagerCommands(CommandParserMixin):
         )
         
         perm_text = "管理员权限" if permission == "admin" else "成员权限"
-        await event.send(MessageChain().message(
+        await _reply(
+            event,
             f"✅ 成功将 {plugin_name} 插件的命令 {command_name} 设置为 {perm_text}。"
-        ))
+        )
 
     async def show_help(self, event: AstrMessageEvent):
         """显示帮助信息"""
-        help_msg = """🔐 批量权限管理插件帮助
-
-📋 命令列表：
-
-1️⃣ 查看插件列表
-   /perm list
-   列出所有已启用的插件及其命令数量
-
-2️⃣ 查看插件命令
-   /perm plugin <插件名>
-   列出指定插件的所有命令及其权限状态
-
-3️⃣ 批量设置插件权限
-   /perm set plugin <插件名> <admin/member>
-   批量设置指定插件的所有命令权限
-   
-   示例：
-   /perm set plugin astrbot admin
-   /perm set plugin astrbot member
-
-4️⃣ 设置单个命令权限
-   /perm set command <插件名> <命令名> <admin/member>
-   设置指定插件的单个命令权限
-   
-   示例：
-   /perm set command astrbot help admin
-
-5️⃣ 修改命令名或指令组名
-   /perm name set <插件名> <命令名> <新名称>
-   修改指定命令或指令组的名称
-   
-   示例：
-   /perm name set astrbot help 帮助
-
-6️⃣ 管理命令别名
-   /perm alias add <插件名> <命令名> <别名> - 添加别名
-   /perm alias remove <插件名> <命令名> <别名> - 删除别名
-   /perm alias list <插件名> <命令名> - 查看别名列表
-   
-   示例：
-   /perm alias add astrbot help h
-   /perm alias remove astrbot help h
-   /perm alias list astrbot help
-
-💡 权限说明：
-   - admin: 仅管理员可使用
-   - member: 所有成员可使用（管理员也可用）
-
-📝 注意：
-   - 批量设置会覆盖所有命令的权限配置
-   - 设置后立即生效，无需重启
-"""
-        await event.send(MessageChain().message(help_msg))
+        await _reply(event, _HELP_MSG)
     
     async def set_command_name(self, event: AstrMessageEvent, plugin_name: str = "", command_name: str = "", new_name: str = ""):
         """修改命令名或指令组名"""
         if not plugin_name or not command_name or not new_name:
-            await event.send(MessageChain().message(
-                "格式: /perm name set <插件名> <命令名> <新名称>\n"
-                "修改指定命令或指令组的名称。\n\n"
-                "示例:\n"
-                "/perm name set astrbot help 帮助 - 将 help 命令改名为 帮助"
-            ))
+            await _reply(event, _USAGE_NAME_SET)
             return
         
-        plugin_commands = self._get_all_commands_by_plugin()
-        if plugin_name not in plugin_commands:
-            await event.send(MessageChain().message(f"未找到插件: {plugin_name}"))
-            return
-        
-        # 查找命令
-        found_handler = None
-        for handler, cmd_name, cmd_type, is_group in plugin_commands[plugin_name]:
-            if cmd_name == command_name:
-                found_handler = handler
-                break
-        
-        if not found_handler:
-            await event.send(MessageChain().message(f"未找到命令: {command_name}"))
+        found_handler = await self._resolve_command(event, plugin_name, command_name)
+        if found_handler is None:
             return
+        # 类型取自查找 handler 时已缓存的过滤器，不再检查 event_filters[0]
+        is_group = _find_command_filters(found_handler)[1] is not None
         
         await self._set_command_name(
             plugin_name,
@@ -486,180 +777,81 @@ class PermissionManagerCommands(CommandParserMixin):
             found_handler
         )
         
-        cmd_type_str = "指令组" if found_handler.event_filters and isinstance(found_handler.event_filters[0], CommandGroupFilter) else "命令"
-        await event.send(MessageChain().message(
+        cmd_type_str = "指令组" if is_group else "命令"
+        await _reply(
+            event,
             f"✅ 成功将 {plugin_name} 插件的{cmd_type_str} {command_name} 改名为 {new_name}。"
-        ))
+        )
     
     async def add_alias(self, event: AstrMessageEvent, plugin_name: str = "", command_name: str = "", alias: str = ""):
         """添加命令别名"""
         if not plugin_name or not command_name or not alias:
-            await event.send(MessageChain().message(
-                "格式: /perm alias add <插件名> <命令名> <别名>\n"
-                "为指定命令添加别名。\n\n"
-                "示例:\n"
-                "/perm alias add astrbot help h - 为 help 命令添加别名 h"
-            ))
+            await _reply(event, _USAGE_ALIAS_ADD)
             return
         
-        plugin_commands = self._get_all_commands_by_plugin()
-        if plugin_name not in plugin_commands:
-            await event.send(MessageChain().message(f"未找到插件: {plugin_name}"))
+        found_handler = await self._resolve_command(event, plugin_name, command_name)
+        if found_handler is None:
             return
         
-        # 查找命令
-        found_handler = None
-        for handler, cmd_name, cmd_type, is_group in plugin_commands[plugin_name]:
-            if cmd_name == command_name:
-                found_handler = handler
-                break
+        # 已存在时不修改；列表保留别名顺序用于存储
+        def add(current_aliases: List[str]) -> Optional[List[str]]:
+            return None if alias in current_aliases else current_aliases + [alias]
         
-        if not found_handler:
-            await event.send(MessageChain().message(f"未找到命令: {command_name}"))
+        if not await self._update_command_aliases(plugin_name, found_handler, add):
+            await _reply(event, f"别名 {alias} 已存在")
             return
         
-        # 获取当前别名列表
-        current_aliases = await self._get_command_aliases(plugin_name, found_handler.handler_name)
-        # 确保 current_aliases 是一个列表
-        if not current_aliases:
-            current_aliases = []
-            # 尝试从过滤器中获取
-            for event_filter in found_handler.event_filters:
-                if isinstance(event_filter, (CommandFilter, CommandGroupFilter)):
-                    if event_filter.alias:
-                        current_aliases = list(event_filter.alias)
-                        break
-        
-        # 确保 current_aliases 是一个列表（防止 None）
-        if not isinstance(current_aliases, list):
-            current_aliases = list(current_aliases) if current_aliases else []
-        
-        if alias in current_aliases:
-            await event.send(MessageChain().message(f"别名 {alias} 已存在"))
-            return
-        
-        current_aliases.append(alias)
-        await self._set_command_aliases(
-            plugin_name,
-            found_handler.handler_name,
-            current_aliases,
-            found_handler
-        )
-        
-        await event.send(MessageChain().message(
+        await _reply(
+            event,
             f"✅ 成功为 {plugin_name} 插件的命令 {command_name} 添加别名 {alias}。"
-        ))
+        )
     
     async def remove_alias(self, event: AstrMessageEvent, plugin_name: str = "", command_name: str = "", alias: str = ""):
         """删除命令别名"""
         if not plugin_name or not command_name or not alias:
-            await event.send(MessageChain().message(
-                "格式: /perm alias remove <插件名> <命令名> <别名>\n"
-                "删除指定命令的别名。\n\n"
-                "示例:\n"
-                "/perm alias remove astrbot help h - 删除 help 命令的别名 h"
-            ))
+            await _reply(event, _USAGE_ALIAS_REMOVE)
             return
         
-        plugin_commands = self._get_all_commands_by_plugin()
-        if plugin_name not in plugin_commands:
-            await event.send(MessageChain().message(f"未找到插件: {plugin_name}"))
+        found_handler = await self._resolve_command(event, plugin_name, command_name)
+        if found_handler is None:
             return
         
-        # 查找命令
-        found_handler = None
-        for handler, cmd_name, cmd_type, is_group in plugin_commands[plugin_name]:
-            if cmd_name == command_name:
-                found_handler = handler
-                break
+        # 不存在时不修改；列表保留别名顺序用于存储
+        def remove(current_aliases: List[str]) -> Optional[List[str]]:
+            if alias not in current_aliases:
+                return None
+            return [a for a in current_aliases if a != alias]
         
-        if not found_handler:
-            await event.send(MessageChain().message(f"未找到命令: {command_name}"))
+        if not await self._update_command_aliases(plugin_name, found_handler, remove):
+            await _reply(event, f"别名 {alias} 不存在")
             return
         
-        # 获取当前别名列表
-        current_aliases = await self._get_command_aliases(plugin_name, found_handler.handler_name)
-        # 确保 current_aliases 是一个列表
-        if not current_aliases:
-            current_aliases = []
-            # 尝试从过滤器中获取
-            for event_filter in found_handler.event_filters:
-                if isinstance(event_filter, (CommandFilter, CommandGroupFilter)):
-                    if event_filter.alias:
-                        current_aliases = list(event_filter.alias)
-                        break
-        
-        # 确保 current_aliases 是一个列表（防止 None）
-        if not isinstance(current_aliases, list):
-            current_aliases = list(current_aliases) if current_aliases else []
-        
-        if alias not in current_aliases:
-            await event.send(MessageChain().message(f"别名 {alias} 不存在"))
-            return
-        
-        current_aliases.remove(alias)
-        await self._set_command_aliases(
-            plugin_name,
-            found_handler.handler_name,
-            current_aliases,
-            found_handler
-        )
-        
-        await event.send(MessageChain().message(
+        await _reply(
+            event,
             f"✅ 成功删除 {plugin_name} 插件的命令 {command_name} 的别名 {alias}。"
-        ))
+        )
     
     async def list_aliases(self, event: AstrMessageEvent, plugin_name: str = "", command_name: str = ""):
         """查看命令别名列表"""
         if not plugin_name or not command_name:
-            await event.send(MessageChain().message(
-                "格式: /perm alias list <插件名> <命令名>\n"
-                "查看指定命令的别名列表。\n\n"
-                "示例:\n"
-                "/perm alias list astrbot help - 查看 help 命令的别名列表"
-            ))
+            await _reply(event, _USAGE_ALIAS_LIST)
             return
         
-        plugin_commands = self._get_all_commands_by_plugin()
-        if plugin_name not in plugin_commands:
-            await event.send(MessageChain().message(f"未找到插件: {plugin_name}"))
-            return
-        
-        # 查找命令
-        found_handler = None
-        for handler, cmd_name, cmd_type, is_group in plugin_commands[plugin_name]:
-            if cmd_name == command_name:
-                found_handler = handler
-                break
-        
-        if not found_handler:
-            await event.send(MessageChain().message(f"未找到命令: {command_name}"))
+        found_handler = await self._resolve_command(event, plugin_name, command_name)
+        if found_handler is None:
             return
         
         # 获取当前别名列表
-        aliases = await self._get_command_aliases(plugin_name, found_handler.handler_name)
-        # 确保 aliases 是一个列表
-        if not aliases:
-            aliases = []
-            # 尝试从过滤器中获取
-            for event_filter in found_handler.event_filters:
-                if isinstance(event_filter, (CommandFilter, CommandGroupFilter)):
-                    if event_filter.alias:
-                        aliases = list(event_filter.alias)
-                        break
-        
-        # 确保 aliases 是一个列表（防止 None）
-        if not isinstance(aliases, list):
-            aliases = list(aliases) if aliases else []
+        aliases = await self._resolve_aliases(plugin_name, found_handler)
         
         if not aliases:
-            await event.send(MessageChain().message(
-                f"命令 {command_name} 没有设置别名。"
-            ))
+            await _reply(event, f"命令 {command_name} 没有设置别名。")
         else:
-            await event.send(MessageChain().message(
-                f"命令 {command_name} 的别名列表：\n" + "\n".join([f"  - {alias}" for alias in aliases])
-            ))
+            # 以分隔符一次拼接，不为每个别名单独格式化字符串
+            await _reply(
+                event,
+                f"命令 {command_name} 的别名列表：\n  - " + "\n  - ".join(aliases)
+            )
 
 
 class Main(star.Star):
@@ -669,23 +861,63 @@ class Main(star.Star):
         self.context = context
         self.config = config or {}
         
-        # 从配置中读取设置
-        webui_config = self.config.get("webui", {}) if self.config else {}
-        self.webui_enabled = webui_config.get("enabled", True) if webui_config else True
-        self.webui_secret_key = webui_config.get("secret_key", "PermissionManager") if webui_config else "PermissionManager"
-        self.webui_port = webui_config.get("port", 8888) if webui_config else 8888
-        self.webui_host = webui_config.get("host", "0.0.0.0") if webui_config else "0.0.0.0"
+        # 从配置中读取设置（self.config 已保证为字典，webui 项缺失或为 None 时按空字典处理）
+        webui_config = self.config.get("webui") or {}
+        self.webui_enabled = webui_config.get("enabled", True)
+        self.webui_secret_key = webui_config.get("secret_key", "PermissionManager")
+        self.webui_port = webui_config.get("port", 8888)
+        self.webui_host = webui_config.get("host", "0.0.0.0")
+        # 访问地址中显示的主机名，监听所有地址时显示本机地址
+        self._webui_display_host = "127.0.0.1" if self.webui_host in ("0.0.0.0", "") else self.webui_host
+        # /perm webui 的用法提示，端口和主机在插件生命周期内不变
+        self._webui_usage = (
+            "Web UI 管理命令：\n"
+            "/perm webui start - 启动 Web UI\n"
+            "/perm webui stop - 停止 Web UI\n"
+            "/perm webui status - 查看 Web UI 状态\n\n"
+            f"当前配置：端口 {self.webui_port}，主机 {self.webui_host}"
+        )
+        # /perm webui start 成功后的提示
+        self._webui_started_msg = (
+            f"✅ 权限管理 Web UI 已启动！\n"
+            f"🔗 请访问 http://{self._webui_display_host}:{self.webui_port}/admin\n"
+            f"🔑 密钥请到插件配置文件中查看（webui.secret_key）\n\n"
+            f"⚠️ 重要提示：\n"
+            f"• 如需公网访问，请自行配置端口转发和防火墙规则\n"
+            f"• 确保端口 {self.webui_port} 已开放并映射到公网IP\n"
+            f"• 建议使用反向代理（如Nginx）增强安全性\n"
+            f"• 请妥善保管密钥，不要泄露给他人"
+        )
+        # 端口检测结果缓存: 最近一次检测到端口可用的时间（事件循环时钟）
+        self._port_available_at: Optional[float] = None
         
-        self.command_enabled = self.config.get("command_enabled", True) if self.config else True
-        self.default_permission = self.config.get("default_permission", "member") if self.config else "member"
-        self.auto_apply_on_load = self.config.get("auto_apply_on_load", True) if self.config else True
-        self.show_permission_in_help = self.config.get("show_permission_in_help", True) if self.config else True
-        self.batch_operation_confirm = self.config.get("batch_operation_confirm", True) if self.config else True
-        self.log_permission_changes = self.config.get("log_permission_changes", False) if self.config else False
+        self.command_enabled = self.config.get("command_enabled", True)
+        self.default_permission = self.config.get("default_permission", "member")
+        self.auto_apply_on_load = self.config.get("auto_apply_on_load", True)
+        self.show_permission_in_help = self.config.get("show_permission_in_help", True)
+        self.batch_operation_confirm = self.config.get("batch_operation_confirm", True)
+        self.log_permission_changes = self.config.get("log_permission_changes", False)
         
         self.perm_cmd = PermissionManagerCommands(context)
-        self.webui_server: PermissionWebUIServer | None = None
+        self.webui_server: Optional["PermissionWebUIServer"] = None
+        # Web UI 的 app 工厂及服务实例，首次启动时导入创建，之后的重启直接复用
+        self._webui_app_factory: Optional[Callable[..., Any]] = None
+        self._webui_services: Optional[Dict[str, Any]] = None
         self._monitor_task: Optional[asyncio.Task] = None
+        # 后台自动启动 Web UI 的任务，保留引用以免被回收，停用插件时取消
+        self._webui_start_task: Optional[asyncio.Task] = None
+        # handler 注册表的变化事件，由包装后的 append/remove 触发
+        self._registry_changed = asyncio.Event()
+        self._registry_hooks: Dict[str, Tuple[Callable, Any]] = {}
+        # 轮询模式下的定期应用：定时器句柄、正在执行的应用任务，以及上次应用时配置是否为空
+        self._reapply_handle: Optional[asyncio.TimerHandle] = None
+        self._reapply_task: Optional[asyncio.Task] = None
+        self._config_empty = False
+        # 上次成功应用配置时的 (注册表指纹, 配置副本)，定期应用时用于跳过没有变化的情况
+        self._applied_state: Optional[Tuple[tuple, Dict[str, Any]]] = None
+        # 监控任务最近一次的错误（类型, 信息）及连续出现次数，相同错误只输出一次堆栈
+        self._monitor_error: Optional[Tuple[type, str]] = None
+        self._monitor_error_count = 0
         
         if self.log_permission_changes:
             logger.info(f"权限管理插件已加载 - Web UI: {self.webui_enabled} (端口: {self.webui_port}), 命令行: {self.command_enabled}")
@@ -694,173 +926,311 @@ class Main(star.Star):
         """插件初始化方法，在插件加载后自动调用"""
         # 如果启用了自动应用配置，从 alter_cmd 配置中加载并应用到所有 handler
         if self.auto_apply_on_load:
+            # 先挂钩注册表：挂钩后指纹改用变更计数，之后应用配置时构建的命令列表缓存才能直接复用
+            # （命令改名会通过 touch_registry 使其失效）
+            self._install_registry_hook()
             await self._apply_config_to_handlers()
-            # 启动后台监控任务，定期检查并应用配置，确保插件重载后配置仍然生效
+            # 启动后台监控任务，插件重载后重新应用配置，确保配置仍然生效
             self._monitor_task = asyncio.create_task(self._monitor_and_apply_config())
         
         # 如果 Web UI 已启用，自动启动
         if self.webui_enabled:
             # 使用 asyncio.create_task 在后台启动 Web UI
-            asyncio.create_task(self._auto_start_webui())
+            self._webui_start_task = asyncio.create_task(self._auto_start_webui())
     
-    async def _apply_config_to_handlers(self):
-        """从 alter_cmd 配置中加载并应用到所有 handler 的过滤器"""
+    async def _apply_config_to_handlers(self, skip_if_unchanged: bool = False) -> bool:
+        """
+        从 alter_cmd 配置中加载并应用到所有 handler 的过滤器
+        skip_if_unchanged: 注册表和配置都与上次应用时相同则跳过（用于定期应用）
+        返回配置中是否有需要应用的命令
+        """
         try:
-            alter_cmd_cfg = await sp.global_get("alter_cmd", {})
-            if not alter_cmd_cfg:
-                return
+            # 包含命令行尚未写入的修改，避免用旧配置覆盖刚设置的过滤器
+            alter_cmd_cfg = await self.perm_cmd._get_alter_cmd()
+            # 配置为空（或只剩清空后的插件项）时无需遍历 handler
+            if not any(alter_cmd_cfg.values()):
+                return False
+            # 指纹在本次应用中复用，只有命令名变化时才需要重新计算
+            fingerprint = registry_fingerprint()
+            if skip_if_unchanged and self._applied_state == (fingerprint, alter_cmd_cfg):
+                return True
             
             applied_count = 0
+            renamed = False
             
-            # 遍历所有已注册的 handler
-            for handler in star_handlers_registry:
-                assert isinstance(handler, StarHandlerMetadata)
-                if handler.handler_module_path not in star_map:
-                    continue
-                
-                plugin = star_map[handler.handler_module_path]
-                if not plugin.activated:
-                    continue
-                
-                plugin_name = plugin.name
-                handler_name = handler.handler_name
-                
-                # 获取该插件的配置
-                plugin_cfg = alter_cmd_cfg.get(plugin_name, {})
-                cmd_cfg = plugin_cfg.get(handler_name, {})
-                
-                if not cmd_cfg:
-                    continue
-                
-                # 查找命令过滤器或指令组过滤器
-                command_filter = None
-                command_group_filter = None
-                for event_filter in handler.event_filters:
-                    if isinstance(event_filter, CommandFilter):
-                        command_filter = event_filter
-                        break
-                    elif isinstance(event_filter, CommandGroupFilter):
-                        command_group_filter = event_filter
-                        break
-                
-                if not command_filter and not command_group_filter:
+            # 只遍历配置中出现的命令，按 (插件名, handler名) 定位 handler
+            handler_index = self.perm_cmd.get_handler_index(fingerprint)
+            for plugin_name, plugin_cfg in alter_cmd_cfg.items():
+                if not plugin_cfg:
                     continue
-                
-                # 应用命令名/指令组名
-                if "name" in cmd_cfg:
-                    new_name = cmd_cfg["name"]
-                    if command_filter:
-                        command_filter.command_name = new_name
-                        command_filter._cmpl_cmd_names = None  # 清除缓存
-                    elif command_group_filter:
-                        command_group_filter.group_name = new_name
-                        command_group_filter._cmpl_cmd_names = None  # 清除缓存
-                
-                # 应用别名
-                if "aliases" in cmd_cfg:
-                    aliases = cmd_cfg["aliases"]
-                    # 确保 aliases 是列表类型
-                    if aliases is None:
-                        aliases = []
-                    elif not isinstance(aliases, list):
-                        aliases = list(aliases) if aliases else []
-                    
-                    if command_filter:
-                        command_filter.alias = set(aliases)
-                        command_filter._cmpl_cmd_names = None  # 清除缓存
-                    elif command_group_filter:
-                        command_group_filter.alias = set(aliases)
-                        command_group_filter._cmpl_cmd_names = None  # 清除缓存
-                
-                # 应用权限（虽然框架可能会自动应用，但为了确保一致性，我们也应用一下）
-                if "permission" in cmd_cfg:
-                    permission = cmd_cfg["permission"]
-                    if permission in ["admin", "member"]:
-                        found_permission_filter = False
-                        for event_filter in handler.event_filters:
-                            if isinstance(event_filter, PermissionTypeFilter):
-                                if permission == "admin":
-                                    event_filter.permission_type = PermissionType.ADMIN
-                                else:
-                                    event_filter.permission_type = PermissionType.MEMBER
-                                found_permission_filter = True
-                                break
-                        
-                        if not found_permission_filter:
-                            handler.event_filters.append(
-                                PermissionTypeFilter(
-                                    PermissionType.ADMIN if permission == "admin" else PermissionType.MEMBER
-                                )
-                            )
-                
-                applied_count += 1
+                for handler_name, cmd_cfg in plugin_cfg.items():
+                    if not cmd_cfg:
+                        continue
+                    handler = handler_index.get((plugin_name, handler_name))
+                    if handler is None:
+                        continue
+                    if self._apply_cmd_cfg(handler, cmd_cfg):
+                        renamed = True
+                    applied_count += 1
+            
+            if renamed:
+                touch_registry()
+                fingerprint = registry_fingerprint()
+            
+            # 记录本次应用时的状态（配置可能被原地修改，保存副本）
+            self._applied_state = (fingerprint, copy.deepcopy(alter_cmd_cfg))
             
             if self.log_permission_changes and applied_count > 0:
                 logger.info(f"已从配置中加载并应用到 {applied_count} 个命令处理器")
         
         except Exception as e:
             logger.error(f"加载 alter_cmd 配置时出错: {e}", exc_info=True)
+        return True
     
+    def _apply_cmd_cfg(self, handler: StarHandlerMetadata, cmd_cfg: Dict[str, Any]) -> bool:
+        """
+        将单个命令的配置应用到 handler 的过滤器
+        返回命令名是否发生变化
+        """
+        renamed = False
+        
+        # 查找命令过滤器或指令组过滤器
+        command_filter, command_group_filter = _find_command_filters(handler)
+        
+        if not command_filter and not command_group_filter:
+            return False
+        
+        # 应用命令名/指令组名
+        if "name" in cmd_cfg:
+            new_name = cmd_cfg["name"]
+            if command_filter:
+                renamed = renamed or command_filter.command_name != new_name
+                command_filter.command_name = new_name
+                command_filter._cmpl_cmd_names = None  # 清除缓存
+            elif command_group_filter:
+                renamed = renamed or command_group_filter.group_name != new_name
+                command_group_filter.group_name = new_name
+                command_group_filter._cmpl_cmd_names = None  # 清除缓存
+        
+        # 应用别名
+        if "aliases" in cmd_cfg:
+            aliases = cmd_cfg["aliases"]
+            if command_filter:
+                command_filter.alias = set(aliases)
+                command_filter._cmpl_cmd_names = None  # 清除缓存
+            elif command_group_filter:
+                command_group_filter.alias = set(aliases)
+                command_group_filter._cmpl_cmd_names = None  # 清除缓存
+        
+        # 应用权限（虽然框架可能会自动应用，但为了确保一致性，我们也应用一下）
+        if "permission" in cmd_cfg:
+            permission = cmd_cfg["permission"]
+            permission_type = _PERM_MAP.get(permission)
+            if permission_type is not None:
+                _set_permission_filter(handler, permission_type)
+        
+        return renamed
+    
+    def _install_registry_hook(self) -> bool:
+        """
+        包装 handler 注册表的 append/remove/clear，注册表变化时递增变更计数并唤醒监控任务
+        返回是否安装成功（注册表不支持实例属性时返回 False，回退为轮询）
+        """
+        registry = star_handlers_registry
+        changed = self._registry_changed
+        hooks = {}
+        try:
+            registry_attrs = vars(registry)
+            # 变更计数供 registry_fingerprint 使用，沿用已有的值保证单调递增
+            registry._perm_manager_version = getattr(registry, "_perm_manager_version", None) or 0
+            for method in ("append", "remove", "clear"):
+                original = getattr(registry, method)
+
+                def hooked(*args, _original=original, **kwargs):
+                    result = _original(*args, **kwargs)
+                    registry._perm_manager_version += 1
+                    changed.set()
+                    return result
+
+                hooks[method] = (hooked, registry_attrs.get(method))
+                setattr(registry, method, hooked)
+        except (AttributeError, TypeError):
+            self._registry_hooks = hooks
+            self._uninstall_registry_hook()
+            return False
+        self._registry_hooks = hooks
+        return True
+
+    def _uninstall_registry_hook(self):
+        """还原 handler 注册表被包装的方法"""
+        registry = star_handlers_registry
+        still_hooked = False
+        for method, (hooked, previous) in self._registry_hooks.items():
+            # 只还原仍由本插件包装的方法，避免覆盖其他插件后装的包装
+            if vars(registry).get(method) is not hooked:
+                still_hooked = True
+                continue
+            if previous is None:
+                delattr(registry, method)
+            else:
+                setattr(registry, method, previous)
+        if self._registry_hooks and not still_hooked:
+            # 不再有包装维护变更计数，指纹回退为逐个 handler 计算
+            registry._perm_manager_version = None
+        self._registry_hooks = {}
+
+    async def _watch_registry_changes(self):
+        """注册表变化驱动的监控任务，没有插件重载时不会被唤醒"""
+        retry_delay = _MONITOR_RETRY_MIN
+        while True:
+            try:
+                await self._registry_changed.wait()
+                # 等待注册表 1 秒内不再变化（插件重载完成），合并期间的多次变化
+                while True:
+                    self._registry_changed.clear()
+                    await asyncio.sleep(1)
+                    if not self._registry_changed.is_set():
+                        break
+                if self.log_permission_changes:
+                    logger.debug("检测到 handler 注册表变化（可能正在重载插件），将重新应用配置")
+                await self._apply_config_to_handlers()
+                self._flush_monitor_error()
+                retry_delay = _MONITOR_RETRY_MIN
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                self._report_monitor_error(e)
+                # 出错后等待更长时间再重试，持续出错时指数退避
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, _MONITOR_RETRY_MAX)
+
     async def _monitor_and_apply_config(self):
-        """后台监控任务，定期检查并应用配置，确保插件重载后配置仍然生效"""
-        # 记录已处理的 handler 标识（插件名+handler名），用于检测是否有新的 handler 注册
-        last_handler_signatures = set()
+        """后台监控任务，handler 注册表变化后重新应用配置，确保插件重载后配置仍然生效"""
+        if self._registry_hooks:
+            await self._watch_registry_changes()
+            return
+        
+        # 注册表无法挂钩时回退为轮询
+        # 已处理的 handler 签名 (插件名, handler名)，按 id(handler) 缓存，只为新注册的 handler 生成签名
+        handler_signatures: Dict[int, Tuple[str, str]] = {}
+        last_fingerprint = None
         check_interval = 2  # 检查间隔（秒）
         apply_interval = 30  # 定期应用配置间隔（秒）
-        last_full_apply = 0
-        
-        import time
+        # 定期重新应用配置由事件循环定时触发，轮询只负责检测 handler 变化
+        self._schedule_periodic_reapply(apply_interval)
+        loop = asyncio.get_running_loop()
+        # 最近一次检测到 handler 变化的时间，注册表稳定 1 秒后才应用配置，合并重载期间的多次变化
+        dirty_since: Optional[float] = None
+        retry_delay = _MONITOR_RETRY_MIN
+        # 扫描循环中用到的查找提前绑定为局部变量
+        star_map_get = star_map.get
+        registry = star_handlers_registry
         
         while True:
             try:
                 await asyncio.sleep(check_interval)
-                current_time = time.time()
-                
-                # 获取当前所有 handler 的签名（插件名:handler名）
-                current_handler_signatures = set()
-                for handler in star_handlers_registry:
-                    assert isinstance(handler, StarHandlerMetadata)
-                    if handler.handler_module_path not in star_map:
-                        continue
-                    plugin = star_map[handler.handler_module_path]
-                    if not plugin.activated:
-                        continue
-                    signature = f"{plugin.name}:{handler.handler_name}"
-                    current_handler_signatures.add(signature)
-                
-                # 如果 handler 集合发生变化，或者达到定期应用时间，重新应用配置
-                should_apply = False
                 
-                # 检查是否有新的 handler（handler 签名不在上次记录中）
-                if current_handler_signatures != last_handler_signatures:
-                    new_handlers = current_handler_signatures - last_handler_signatures
-                    removed_handlers = last_handler_signatures - current_handler_signatures
-                    if new_handlers or removed_handlers:
-                        should_apply = True
+                # 注册表指纹未变化时跳过重新扫描
+                fingerprint = registry_fingerprint()
+                if fingerprint != last_fingerprint:
+                    last_fingerprint = fingerprint
+                    cached_signature = handler_signatures.get
+                    current_signatures: Dict[int, Tuple[str, str]] = {
+                        id(handler): (
+                            cached_signature(id(handler))
+                            or (plugin.name, handler.handler_name)
+                        )
+                        for handler in registry
+                        if (plugin := star_map_get(handler.handler_module_path)) is not None
+                        and plugin.activated
+                    }
+                    
+                    # 检查是否有新注册或被移除的 handler（键视图比较，长度不同时直接返回）
+                    if current_signatures.keys() != handler_signatures.keys():
+                        dirty_since = loop.time()
                         if self.log_permission_changes:
-                            if new_handlers:
-                                logger.debug(f"检测到 {len(new_handlers)} 个新注册的 handler，将重新应用配置")
-                            if removed_handlers:
-                                logger.debug(f"检测到 {len(removed_handlers)} 个 handler 被移除（可能正在重载），将重新应用配置")
-                        # 等待一小段时间，确保插件重载完成
-                        await asyncio.sleep(1)
-                
-                # 定期重新应用配置（即使 handler 没有变化，也要确保配置生效）
-                if current_time - last_full_apply >= apply_interval:
-                    should_apply = True
-                    last_full_apply = current_time
+                            # 仅在需要输出日志时计算差异，按所在一侧区分新增与移除
+                            changed = current_signatures.keys() ^ handler_signatures.keys()
+                            new_count = sum(1 for handler_id in changed if handler_id in current_signatures)
+                            removed_count = len(changed) - new_count
+                            if new_count:
+                                logger.debug(f"检测到 {new_count} 个新注册的 handler，将重新应用配置")
+                            if removed_count:
+                                logger.debug(f"检测到 {removed_count} 个 handler 被移除（可能正在重载），将重新应用配置")
+                    
+                    # 更新记录的 handler 签名
+                    handler_signatures = current_signatures
                 
-                if should_apply and self.auto_apply_on_load:
-                    await self._apply_config_to_handlers()
+                # handler 集合发生变化且已稳定，重新应用配置
+                if dirty_since is not None and loop.time() - dirty_since >= 1:
+                    dirty_since = None
+                    if self.auto_apply_on_load:
+                        self._config_empty = not await self._apply_config_to_handlers()
                 
-                # 更新记录的 handler 签名集合
-                last_handler_signatures = current_handler_signatures
+                if self._monitor_error is not None:
+                    self._flush_monitor_error()
+                retry_delay = _MONITOR_RETRY_MIN
                         
             except asyncio.CancelledError:
                 break
             except Exception as e:
-                logger.error(f"监控配置应用任务出错: {e}", exc_info=True)
-                await asyncio.sleep(5)  # 出错后等待更长时间再重试
+                self._report_monitor_error(e)
+                # 出错后等待更长时间再重试，持续出错时指数退避
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, _MONITOR_RETRY_MAX)
+        self._cancel_periodic_reapply()
+
+    def _report_monitor_error(self, e: Exception):
+        """记录监控任务的错误，与上一次相同的错误只计数，不重复输出堆栈"""
+        signature = (type(e), str(e))
+        if signature == self._monitor_error:
+            self._monitor_error_count += 1
+            return
+        self._flush_monitor_error()
+        logger.error(f"监控配置应用任务出错: {e}", exc_info=True)
+        self._monitor_error = signature
+        self._monitor_error_count = 1
+
+    def _flush_monitor_error(self):
+        """输出被合并的重复错误次数，并清除错误记录"""
+        if self._monitor_error_count > 1:
+            error_type, message = self._monitor_error
+            logger.error(
+                f"监控配置应用任务出错: {error_type.__name__}: {message}"
+                f"（相同错误共出现 {self._monitor_error_count} 次）"
+            )
+        self._monitor_error = None
+        self._monitor_error_count = 0
+
+    def _schedule_periodic_reapply(self, interval: float):
+        """
+        每隔 interval 秒重新应用一次配置（即使 handler 没有变化，也要确保配置生效）
+        上次应用时配置为空则跳过（命令行/Web UI 修改会直接更新过滤器）
+        """
+        loop = asyncio.get_running_loop()
+
+        def reapply():
+            if not self._config_empty and self.auto_apply_on_load:
+                if self._reapply_task is None or self._reapply_task.done():
+                    self._reapply_task = asyncio.create_task(self._periodic_reapply())
+            self._reapply_handle = loop.call_later(interval, reapply)
+
+        self._reapply_handle = loop.call_later(interval, reapply)
+
+    async def _periodic_reapply(self):
+        try:
+            self._config_empty = not await self._apply_config_to_handlers(skip_if_unchanged=True)
+        except Exception as e:
+            logger.error(f"定期应用配置时出错: {e}", exc_info=True)
+
+    def _cancel_periodic_reapply(self):
+        """取消定期应用的定时器和正在执行的应用任务"""
+        if self._reapply_handle is not None:
+            self._reapply_handle.cancel()
+            self._reapply_handle = None
+        if self._reapply_task is not None and not self._reapply_task.done():
+            self._reapply_task.cancel()
+        self._reapply_task = None
 
     @filter.command_group("perm")
     def perm(self):
@@ -869,20 +1239,16 @@ class Main(star.Star):
 
     @filter.permission_type(filter.PermissionType.ADMIN)
     @perm.command("list")
+    @_require_command_enabled
     async def perm_list(self, event: AstrMessageEvent):
         """列出所有插件"""
-        if not self.command_enabled:
-            await event.send(MessageChain().message("命令行功能已禁用，请在 Web UI 中管理权限。"))
-            return
         await self.perm_cmd.list_plugins(event)
 
     @filter.permission_type(filter.PermissionType.ADMIN)
     @perm.command("plugin")
+    @_require_command_enabled
     async def perm_plugin(self, event: AstrMessageEvent, plugin_name: str = ""):
         """查看插件命令列表"""
-        if not self.command_enabled:
-            await event.send(MessageChain().message("命令行功能已禁用，请在 Web UI 中管理权限。"))
-            return
         await self.perm_cmd.list_plugin_commands(event, plugin_name)
 
     @perm.group("set")
@@ -892,12 +1258,9 @@ class Main(star.Star):
 
     @filter.permission_type(filter.PermissionType.ADMIN)
     @perm_set.command("plugin")
+    @_require_command_enabled
     async def perm_set_plugin(self, event: AstrMessageEvent, plugin_name: str = "", permission: str = ""):
         """批量设置插件权限"""
-        if not self.command_enabled:
-            await event.send(MessageChain().message("命令行功能已禁用，请在 Web UI 中管理权限。"))
-            return
-        
         # 如果需要确认
         if self.batch_operation_confirm:
             # 这里可以添加确认逻辑，暂时直接执行
@@ -910,12 +1273,9 @@ class Main(star.Star):
 
     @filter.permission_type(filter.PermissionType.ADMIN)
     @perm_set.command("command")
+    @_require_command_enabled
     async def perm_set_command(self, event: AstrMessageEvent, plugin_name: str = "", command_name: str = "", permission: str = ""):
         """设置单个命令权限"""
-        if not self.command_enabled:
-            await event.send(MessageChain().message("命令行功能已禁用，请在 Web UI 中管理权限。"))
-            return
-        
         await self.perm_cmd.set_command(event, plugin_name, command_name, permission)
         
         if self.log_permission_changes:
@@ -923,11 +1283,9 @@ class Main(star.Star):
 
     @filter.permission_type(filter.PermissionType.ADMIN)
     @perm.command("help")
+    @_require_command_enabled
     async def perm_help(self, event: AstrMessageEvent):
         """显示帮助信息"""
-        if not self.command_enabled:
-            await event.send(MessageChain().message("命令行功能已禁用，请在 Web UI 中管理权限。"))
-            return
         await self.perm_cmd.show_help(event)
     
     @perm.group("name")
@@ -937,11 +1295,9 @@ class Main(star.Star):
     
     @filter.permission_type(filter.PermissionType.ADMIN)
     @perm_name.command("set")
+    @_require_command_enabled
     async def perm_name_set(self, event: AstrMessageEvent, plugin_name: str = "", command_name: str = "", new_name: str = ""):
         """修改命令名或指令组名"""
-        if not self.command_enabled:
-            await event.send(MessageChain().message("命令行功能已禁用，请在 Web UI 中管理权限。"))
-            return
         await self.perm_cmd.set_command_name(event, plugin_name, command_name, new_name)
     
     @perm.group("alias")
@@ -951,39 +1307,30 @@ class Main(star.Star):
     
     @filter.permission_type(filter.PermissionType.ADMIN)
     @perm_alias.command("add")
+    @_require_command_enabled
     async def perm_alias_add(self, event: AstrMessageEvent, plugin_name: str = "", command_name: str = "", alias: str = ""):
         """添加命令别名"""
-        if not self.command_enabled:
-            await event.send(MessageChain().message("命令行功能已禁用，请在 Web UI 中管理权限。"))
-            return
         await self.perm_cmd.add_alias(event, plugin_name, command_name, alias)
     
     @filter.permission_type(filter.PermissionType.ADMIN)
     @perm_alias.command("remove")
+    @_require_command_enabled
     async def perm_alias_remove(self, event: AstrMessageEvent, plugin_name: str = "", command_name: str = "", alias: str = ""):
         """删除命令别名"""
-        if not self.command_enabled:
-            await event.send(MessageChain().message("命令行功能已禁用，请在 Web UI 中管理权限。"))
-            return
         await self.perm_cmd.remove_alias(event, plugin_name, command_name, alias)
     
     @filter.permission_type(filter.PermissionType.ADMIN)
     @perm_alias.command("list")
+    @_require_command_enabled
     async def perm_alias_list(self, event: AstrMessageEvent, plugin_name: str = "", command_name: str = ""):
         """查看命令别名列表"""
-        if not self.command_enabled:
-            await event.send(MessageChain().message("命令行功能已禁用，请在 Web UI 中管理权限。"))
-            return
         await self.perm_cmd.list_aliases(event, plugin_name, command_name)
     
     @filter.permission_type(filter.PermissionType.ADMIN)
     @perm.command("webui")
+    @_require_webui_enabled
     async def perm_webui(self, event: AstrMessageEvent, action: str = ""):
         """启动/停止 Web UI"""
-        if not self.webui_enabled:
-            await event.send(MessageChain().message("Web UI 功能已禁用，请在插件配置中启用。"))
-            return
-        
         if action == "start":
             await self._start_webui(event)
         elif action == "stop":
@@ -991,21 +1338,14 @@ class Main(star.Star):
         elif action == "status":
             await self._webui_status(event)
         else:
-            await event.send(MessageChain().message(
-                "Web UI 管理命令：\n"
-                "/perm webui start - 启动 Web UI\n"
-                "/perm webui stop - 停止 Web UI\n"
-                "/perm webui status - 查看 Web UI 状态\n\n"
-                f"当前配置：端口 {self.webui_port}，主机 {self.webui_host}"
-            ))
+            await _reply(event, self._webui_usage)
     
     async def _auto_start_webui(self):
         """自动启动 Web UI（静默启动，不发送消息）"""
         if not self.webui_enabled:
             return
 
-        server = self._ensure_webui_server()
-        if server.is_running:
+        if self.webui_server and self.webui_server.is_running:
             logger.info("Web UI 已经在运行中")
             return
 
@@ -1015,13 +1355,16 @@ class Main(star.Star):
             logger.warning(f"端口 {self.webui_port} 已被占用，Web UI 启动失败。请更换端口后重试。")
             return
 
+        # 端口可用时才创建服务包装器，端口被占用时不必导入 uvicorn/quart；
+        # 创建时才导入 uvicorn，缺少依赖导致的导入错误也在这里捕获
         try:
+            server = self._ensure_webui_server()
             await server.start()
             logger.info(
                 "✅ 权限管理 Web UI 已自动启动！\n"
                 "🔗 访问地址: http://%s:%s/admin\n"
                 "🔑 密钥请到插件配置文件中查看（webui.secret_key）",
-                self._get_webui_display_host(),
+                self._webui_display_host,
                 self.webui_port,
             )
         except Exception as e:
@@ -1029,21 +1372,17 @@ class Main(star.Star):
 
     async def _start_webui(self, event: AstrMessageEvent = None):
         """启动 Web UI（手动启动，会发送消息）"""
-        server = self._ensure_webui_server()
-
-        if server.is_running:
+        if self.webui_server and self.webui_server.is_running:
             if event:
-                await event.send(MessageChain().message("❌ Web UI 已经在运行中"))
+                await _reply(event, "❌ Web UI 已经在运行中")
             return
 
         if event:
-            await event.send(MessageChain().message("🔄 正在启动权限管理 Web UI..."))
+            await _reply(event, "🔄 正在启动权限管理 Web UI...")
 
         if not await self._is_port_available():
             if event:
-                await event.send(
-                    MessageChain().message(f"❌ 端口 {self.webui_port} 已被占用，请更换端口后重试")
-                )
+                await _reply(event, f"❌ 端口 {self.webui_port} 已被占用，请更换端口后重试")
             else:
                 logger.warning(
                     f"端口 {self.webui_port} 已被占用，无法启动权限管理 Web UI"
@@ -1051,38 +1390,28 @@ class Main(star.Star):
             return
 
         try:
+            server = self._ensure_webui_server()
             await server.start()
             if event:
-                display_host = self._get_webui_display_host()
-                message = (
-                    f"✅ 权限管理 Web UI 已启动！\n"
-                    f"🔗 请访问 http://{display_host}:{self.webui_port}/admin\n"
-                    f"🔑 密钥请到插件配置文件中查看（webui.secret_key）\n\n"
-                    f"⚠️ 重要提示：\n"
-                    f"• 如需公网访问，请自行配置端口转发和防火墙规则\n"
-                    f"• 确保端口 {self.webui_port} 已开放并映射到公网IP\n"
-                    f"• 建议使用反向代理（如Nginx）增强安全性\n"
-                    f"• 请妥善保管密钥，不要泄露给他人"
-                )
-                await event.send(MessageChain().message(message))
+                await _reply(event, self._webui_started_msg)
         except Exception as e:
             logger.error(f"启动 Web UI 失败: {e}", exc_info=True)
             if event:
-                await event.send(MessageChain().message(f"❌ 启动 Web UI 失败: {e}"))
+                await _reply(event, f"❌ 启动 Web UI 失败: {e}")
 
     async def _stop_webui(self, event: AstrMessageEvent):
         """停止 Web UI"""
         server = self.webui_server
         if not server or not server.is_running:
-            await event.send(MessageChain().message("❌ Web UI 没有在运行中"))
+            await _reply(event, "❌ Web UI 没有在运行中")
             return
 
         try:
             await server.stop()
-            await event.send(MessageChain().message("✅ Web UI 已关闭"))
+            await _reply(event, "✅ Web UI 已关闭")
         except Exception as e:
             logger.error(f"关闭 Web UI 失败: {e}", exc_info=True)
-            await event.send(MessageChain().message(f"❌ 关闭 Web UI 失败: {e}"))
+            await _reply(event, f"❌ 关闭 Web UI 失败: {e}")
 
     async def _webui_status(self, event: AstrMessageEvent):
         """查看 Web UI 状态"""
@@ -1090,59 +1419,63 @@ class Main(star.Star):
         is_running = server.is_running if server else False
         status = "运行中" if is_running else "未运行"
 
-        display_host = self._get_webui_display_host()
+        display_host = self._webui_display_host
 
-        await event.send(
-            MessageChain().message(
-                f"Web UI 状态：{status}\n"
-                f"端口：{self.webui_port}\n"
-                f"主机：{self.webui_host}\n"
-                f"访问地址：http://{display_host}:{self.webui_port}/admin\n"
-                f"密钥：请到插件配置文件中查看（webui.secret_key）"
-            )
+        await _reply(
+            event,
+            f"Web UI 状态：{status}\n"
+            f"端口：{self.webui_port}\n"
+            f"主机：{self.webui_host}\n"
+            f"访问地址：http://{display_host}:{self.webui_port}/admin\n"
+            f"密钥：请到插件配置文件中查看（webui.secret_key）"
         )
 
-    def _ensure_webui_server(self) -> PermissionWebUIServer:
+    def _ensure_webui_server(self) -> "PermissionWebUIServer":
         if self.webui_server is None:
-            app_factory = self._get_webui_app_factory()
+            from .webui import WebUIServer as PermissionWebUIServer
+
             self.webui_server = PermissionWebUIServer(
                 host=self.webui_host,
                 port=self.webui_port,
-                app_factory=app_factory,
+                app_factory=self._create_webui_app,
                 startup_path="/admin",
             )
         return self.webui_server
 
-    def _get_webui_app_factory(self) -> Callable[[], Any]:
-        from .manager.server import create_app
-        from .manager.service import PermissionService
-
-        secret_key = self.webui_secret_key
-
-        def _factory():
-            services = {"permission_service": PermissionService()}
-            return create_app(secret_key=secret_key, services=services)
+    def _create_webui_app(self) -> Any:
+        """Web UI 应用工厂，首次启动服务时调用，应用随 uvicorn 配置跨重启复用（依赖在此时才导入）"""
+        if self._webui_app_factory is None:
+            from .manager.server import create_app
+            from .manager.service import PermissionService
 
-        return _factory
-
-    def _get_webui_display_host(self) -> str:
-        return "127.0.0.1" if self.webui_host in ("0.0.0.0", "") else self.webui_host
+            self._webui_app_factory = create_app
+            self._webui_services = {"permission_service": PermissionService()}
+        return self._webui_app_factory(secret_key=self.webui_secret_key, services=self._webui_services)
 
     async def _is_port_available(self) -> bool:
-        import socket
-
-        def check() -> bool:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-                try:
-                    bind_host = self.webui_host or "0.0.0.0"
-                    sock.bind((bind_host, self.webui_port))
-                except OSError:
-                    return False
-                return True
+        """检测 Web UI 端口是否可用，端口可用的结果缓存 5 秒（被占用时总是重新检测）"""
+        loop = asyncio.get_running_loop()
+        if self._port_available_at is not None and loop.time() - self._port_available_at < 5:
+            return True
 
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, check)
+        # 由事件循环尝试监听后立即关闭：IP 地址直接绑定，主机名通过事件循环异步解析
+        try:
+            server = await loop.create_server(
+                asyncio.Protocol,
+                self.webui_host or "0.0.0.0",
+                self.webui_port,
+                family=socket.AF_INET,
+                reuse_address=True,
+                start_serving=False,
+            )
+        except OSError:
+            available = False
+        else:
+            server.close()
+            await server.wait_closed()
+            available = True
+        self._port_available_at = loop.time() if available else None
+        return available
     
     async def terminate(self):
         """插件被卸载/停用时调用"""
@@ -1156,8 +1489,25 @@ class Main(star.Star):
             except Exception as e:
                 logger.error(f"停止监控任务时出错: {e}", exc_info=True)
             self._monitor_task = None
+        self._cancel_periodic_reapply()
+        self._flush_monitor_error()
+        self._uninstall_registry_hook()
         
-        # 停止 Web UI 服务
+        # 写入尚未落盘的权限配置
+        try:
+            await self.perm_cmd.flush()
+        except Exception as e:
+            logger.error(f"写入权限配置时出错: {e}", exc_info=True)
+        
+        # 停止 Web UI 服务：先取消尚未完成的自动启动协程（只取消等待，不会取消 uvicorn 的 serve 任务），
+        # 再由 stop() 通知 uvicorn 优雅退出并等待其结束
+        if self._webui_start_task and not self._webui_start_task.done():
+            self._webui_start_task.cancel()
+            try:
+                await self._webui_start_task
+            except asyncio.CancelledError:
+                pass
+        self._webui_start_task = None
         if self.webui_server and self.webui_server.is_running:
             try:
                 await self.webui_server.stop()
@@ -1,21 +1,57 @@
 import functools
+import gzip
+import logging
+import mimetypes
 import os
 import traceback
-from typing import Dict, Any
+import zlib
+from typing import Dict, Any, Optional, Tuple
 from quart import (
-    Quart, render_template, request, redirect, url_for, session, flash,
-    Blueprint, current_app, jsonify
+    Quart, render_template, request, redirect, session, flash,
+    Blueprint, current_app, g, abort
 )
 from astrbot.api import logger
 
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖，未安装时使用 Quart 自带的 JSON 序列化
+    orjson = None
 
+
+# 静态文件由下方的 static 路由从内存提供，不使用 Blueprint 自带的静态文件处理
 admin_bp = Blueprint(
     "admin_bp",
     __name__,
     template_folder="templates",
-    static_folder="static",
 )
 
+_STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+
+def _load_static_files(static_dir: str) -> Dict[str, Tuple[bytes, Optional[bytes], str, str]]:
+    """
+    读入全部静态文件，返回 {相对路径: (原始内容, gzip 内容, Content-Type, ETag)}
+    gzip 后没有变小的文件不保存压缩版本
+    """
+    files = {}
+    for root, _dirs, names in os.walk(static_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                data = f.read()
+            compressed = gzip.compress(data, mtime=0)
+            content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            if content_type.startswith("text/") or content_type.endswith("javascript"):
+                content_type += "; charset=utf-8"
+            rel_path = os.path.relpath(path, static_dir).replace(os.sep, "/")
+            files[rel_path] = (
+                data,
+                compressed if len(compressed) < len(data) else None,
+                content_type,
+                f'W/"{len(data):x}-{zlib.crc32(data):08x}"',
+            )
+    return files
+
 
 def create_app(secret_key: str, services: Dict[str, Any]):
     """
@@ -28,26 +64,33 @@ def create_app(secret_key: str, services: Dict[str, Any]):
     app = Quart(__name__)
     app.secret_key = os.urandom(24)
     app.config["SECRET_LOGIN_KEY"] = secret_key
+    app.config["STATIC_FILES"] = _load_static_files(_STATIC_DIR)
 
     # 将所有注入的服务实例存入app的配置中，供路由函数使用
     for service_name, service_instance in services.items():
         app.config[service_name.upper()] = service_instance
 
     app.register_blueprint(admin_bp, url_prefix="/admin")
+    # 重定向用到的地址在注册路由后一次解析，路由中不再逐次调用 url_for
+    url_adapter = app.url_map.bind("")
+    app.config["URLS"] = {
+        "index": url_adapter.build("admin_bp.index"),
+        "login": url_adapter.build("admin_bp.login"),
+    }
 
     @app.route("/")
     def root():
-        return redirect(url_for("admin_bp.index"))
+        return redirect(current_app.config["URLS"]["index"])
     
     @app.route("/favicon.ico")
     def favicon():
-        from quart import abort
-        abort(404)
+        # 没有图标，直接返回空的 204，不经过 404 错误处理
+        return "", 204
     
     # 添加全局错误处理器
     @app.errorhandler(404)
     async def handle_404_error(error):
-        if not request.path.startswith('/admin/static/') and request.path != '/favicon.ico':
+        if not request.path.startswith('/admin/static/'):
             logger.error(f"404 Not Found: {request.url} - {request.method}")
         
         if request.path.startswith('/admin/api/') and request.method in ['POST', 'PUT', 'DELETE', 'GET']:
@@ -56,8 +99,9 @@ def create_app(secret_key: str, services: Dict[str, Any]):
     
     @app.errorhandler(500)
     async def handle_500_error(error):
-        logger.error(f"Internal Server Error: {error}")
-        logger.error(traceback.format_exc())
+        # 格式化堆栈开销较大，日志级别不输出 ERROR 时跳过
+        if logger.isEnabledFor(logging.ERROR):
+            logger.error("Internal Server Error: %s\n%s", error, traceback.format_exc())
         
         if request.path.startswith('/admin/api/') and request.method in ['POST', 'PUT', 'DELETE', 'GET']:
             return {"success": False, "message": "服务器内部错误"}, 500
@@ -66,11 +110,45 @@ def create_app(secret_key: str, services: Dict[str, Any]):
     return app
 
 
+def _dump_json(data: Dict[str, Any]) -> bytes:
+    """序列化为 JSON bytes，安装了 orjson 时使用 orjson"""
+    if orjson is None:
+        return current_app.json.dumps(data, separators=(",", ":")).encode("utf-8")
+    return orjson.dumps(data)
+
+
+def _json_response(data: Dict[str, Any], status: int = 200):
+    """返回 JSON 响应对象"""
+    return current_app.response_class(_dump_json(data), status=status, mimetype="application/json")
+
+
+@admin_bp.route("/static/<path:filename>", endpoint="static")
+async def static_file(filename: str):
+    """从内存返回静态文件，客户端支持时返回 gzip 版本"""
+    entry = current_app.config["STATIC_FILES"].get(filename)
+    if entry is None:
+        abort(404)
+    data, compressed, content_type, etag = entry
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if request.headers.get("If-None-Match") == etag:
+        return "", 304, headers
+    if compressed is not None and "gzip" in request.headers.get("Accept-Encoding", ""):
+        data = compressed
+        headers["Content-Encoding"] = "gzip"
+    return current_app.response_class(data, content_type=content_type, headers=headers)
+
+
+@admin_bp.before_request
+async def load_login_state():
+    """每个请求只解析一次登录状态，存到 g 上供 login_required 检查"""
+    g.logged_in = "logged_in" in session
+
+
 def login_required(f):
     @functools.wraps(f)
     async def decorated_function(*args, **kwargs):
-        if "logged_in" not in session:
-            return redirect(url_for("admin_bp.login"))
+        if not g.logged_in:
+            return redirect(current_app.config["URLS"]["login"])
         return await f(*args, **kwargs)
     return decorated_function
 
@@ -84,7 +162,7 @@ async def login():
             session["logged_in"] = True
             session["is_admin"] = True
             await flash("登录成功！", "success")
-            return redirect(url_for("admin_bp.index"))
+            return redirect(current_app.config["URLS"]["index"])
         else:
             await flash("登录失败，请检查密钥！", "danger")
     return await render_template("login.html")
@@ -94,7 +172,7 @@ async def login():
 async def logout():
     session.pop("logged_in", None)
     await flash("你已成功登出。", "info")
-    return redirect(url_for("admin_bp.login"))
+    return redirect(current_app.config["URLS"]["login"])
 
 
 @admin_bp.route("/")
@@ -111,12 +189,12 @@ async def plugin_detail(plugin_name: str):
     permission_service = current_app.config.get("PERMISSION_SERVICE")
     if not permission_service:
         await flash("权限服务未初始化", "danger")
-        return redirect(url_for("admin_bp.index"))
+        return redirect(current_app.config["URLS"]["index"])
     
     commands = await permission_service.get_plugin_commands(plugin_name)
     if commands is None:
         await flash(f"未找到插件: {plugin_name}", "danger")
-        return redirect(url_for("admin_bp.index"))
+        return redirect(current_app.config["URLS"]["index"])
     
     return await render_template("plugin_detail.html", plugin_name=plugin_name, commands=commands)
 
@@ -126,10 +204,22 @@ async def plugin_detail(plugin_name: str):
 async def api_plugins():
     permission_service = current_app.config.get("PERMISSION_SERVICE")
     if not permission_service:
-        return jsonify({"success": False, "message": "权限服务未初始化"}), 500
+        return _json_response({"success": False, "message": "权限服务未初始化"}, 500)
+    
+    # 插件列表只随插件加载/卸载、启停和命令改名变化，浏览器带着相同 ETag 重新请求时直接返回 304，
+    # 否则返回按 ETag 缓存的序列化结果，ETag 变化后才重新序列化。
+    # ETag 取自注册表指纹，有意不随权限修改变化：插件列表中不包含权限信息
+    # （新增会随权限变化的字段时需要把权限配置也纳入 ETag）
+    etag = permission_service.get_plugins_etag()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("If-None-Match") == etag:
+        return "", 304, headers
     
-    plugins = permission_service.get_all_plugins()
-    return jsonify({"success": True, "data": plugins})
+    cached = current_app.config.get("PLUGINS_PAYLOAD")
+    if cached is None or cached[0] != etag:
+        cached = (etag, _dump_json({"success": True, "data": permission_service.get_all_plugins()}))
+        current_app.config["PLUGINS_PAYLOAD"] = cached
+    return current_app.response_class(cached[1], mimetype="application/json", headers=headers)
 
 
 @admin_bp.route("/api/plugin/<plugin_name>/commands", methods=["GET"])
@@ -137,13 +227,13 @@ async def api_plugins():
 async def api_plugin_commands(plugin_name: str):
     permission_service = current_app.config.get("PERMISSION_SERVICE")
     if not permission_service:
-        return jsonify({"success": False, "message": "权限服务未初始化"}), 500
+        return _json_response({"success": False, "message": "权限服务未初始化"}, 500)
     
     commands = await permission_service.get_plugin_commands(plugin_name)
     if commands is None:
-        return jsonify({"success": False, "message": f"未找到插件: {plugin_name}"}), 404
+        return _json_response({"success": False, "message": f"未找到插件: {plugin_name}"}, 404)
     
-    return jsonify({"success": True, "data": commands})
+    return _json_response({"success": True, "data": commands})
 
 
 @admin_bp.route("/api/plugin/<plugin_name>/set-permission", methods=["POST"])
@@ -151,19 +241,19 @@ async def api_plugin_commands(plugin_name: str):
 async def api_set_plugin_permission(plugin_name: str):
     permission_service = current_app.config.get("PERMISSION_SERVICE")
     if not permission_service:
-        return jsonify({"success": False, "message": "权限服务未初始化"}), 500
+        return _json_response({"success": False, "message": "权限服务未初始化"}, 500)
     
     data = await request.json
     permission = data.get("permission")
     
     if permission not in ["admin", "member"]:
-        return jsonify({"success": False, "message": "权限类型错误，只能是 admin 或 member"}), 400
+        return _json_response({"success": False, "message": "权限类型错误，只能是 admin 或 member"}, 400)
     
     result = await permission_service.set_plugin_permission(plugin_name, permission)
     if result["success"]:
-        return jsonify({"success": True, "message": result["message"], "data": result})
+        return _json_response({"success": True, "message": result["message"], "data": result})
     else:
-        return jsonify({"success": False, "message": result["message"]}), 400
+        return _json_response({"success": False, "message": result["message"]}, 400)
 
 
 @admin_bp.route("/api/command/<plugin_name>/<handler_name>/set-permission", methods=["POST"])
@@ -171,19 +261,19 @@ async def api_set_plugin_permission(plugin_name: str):
 async def api_set_command_permission(plugin_name: str, handler_name: str):
     permission_service = current_app.config.get("PERMISSION_SERVICE")
     if not permission_service:
-        return jsonify({"success": False, "message": "权限服务未初始化"}), 500
+        return _json_response({"success": False, "message": "权限服务未初始化"}, 500)
     
     data = await request.json
     permission = data.get("permission")
     
     if permission not in ["admin", "member"]:
-        return jsonify({"success": False, "message": "权限类型错误，只能是 admin 或 member"}), 400
+        return _json_response({"success": False, "message": "权限类型错误，只能是 admin 或 member"}, 400)
     
     result = await permission_service.set_command_permission(plugin_name, handler_name, permission)
     if result["success"]:
-        return jsonify({"success": True, "message": result["message"]})
+        return _json_response({"success": True, "message": result["message"]})
     else:
-        return jsonify({"success": False, "message": result["message"]}), 400
+        return _json_response({"success": False, "message": result["message"]}, 400)
 
 
 @admin_bp.route("/api/command/<plugin_name>/<handler_name>/set-name", methods=["POST"])
@@ -191,19 +281,19 @@ async def api_set_command_permission(plugin_name: str, handler_name: str):
 async def api_set_command_name(plugin_name: str, handler_name: str):
     permission_service = current_app.config.get("PERMISSION_SERVICE")
     if not permission_service:
-        return jsonify({"success": False, "message": "权限服务未初始化"}), 500
+        return _json_response({"success": False, "message": "权限服务未初始化"}, 500)
     
     data = await request.json
     new_name = data.get("name")
     
     if not new_name:
-        return jsonify({"success": False, "message": "新名称不能为空"}), 400
+        return _json_response({"success": False, "message": "新名称不能为空"}, 400)
     
     result = await permission_service.set_command_name(plugin_name, handler_name, new_name)
     if result["success"]:
-        return jsonify({"success": True, "message": result["message"]})
+        return _json_response({"success": True, "message": result["message"]})
     else:
-        return jsonify({"success": False, "message": result["message"]}), 400
+        return _json_response({"success": False, "message": result["message"]}, 400)
 
 
 @admin_bp.route("/api/command/<plugin_name>/<handler_name>/set-aliases", methods=["POST"])
@@ -211,17 +301,17 @@ async def api_set_command_name(plugin_name: str, handler_name: str):
 async def api_set_command_aliases(plugin_name: str, handler_name: str):
     permission_service = current_app.config.get("PERMISSION_SERVICE")
     if not permission_service:
-        return jsonify({"success": False, "message": "权限服务未初始化"}), 500
+        return _json_response({"success": False, "message": "权限服务未初始化"}, 500)
     
     data = await request.json
     aliases = data.get("aliases", [])
     
     if not isinstance(aliases, list):
-        return jsonify({"success": False, "message": "别名必须是列表格式"}), 400
+        return _json_response({"success": False, "message": "别名必须是列表格式"}, 400)
     
     result = await permission_service.set_command_aliases(plugin_name, handler_name, aliases)
     if result["success"]:
-        return jsonify({"success": True, "message": result["message"]})
+        return _json_response({"success": True, "message": result["message"]})
     else:
-        return jsonify({"success": False, "message": result["message"]}), 400
+        return _json_response({"success": False, "message": result["message"]}, 400)
 
@@ -1,25 +1,60 @@
 """权限管理服务类，用于 Web UI"""
-from typing import Dict, List, Optional, Any
+import asyncio
+from typing import Dict, List, Optional, Any, Tuple
 from astrbot.core.star.star_handler import star_handlers_registry, StarHandlerMetadata
 from astrbot.core.star.star import star_map
 from astrbot.core.star.filter.command import CommandFilter
 from astrbot.core.star.filter.command_group import CommandGroupFilter
 from astrbot.core.star.filter.permission import PermissionTypeFilter, PermissionType
 from astrbot.api import sp
+from ..registry_state import ALTER_CMD_SNAPSHOT_TTL, registry_fingerprint, touch_registry
+
+
+# 命令没有配置项时使用的空配置，只读，避免逐个命令新建空字典
+_EMPTY_CMD_CFG: Dict[str, Any] = {}
+
+
+def _scan_handler_filters(handler: StarHandlerMetadata) -> Tuple[Any, Optional[PermissionTypeFilter]]:
+    """一次遍历找出 handler 的第一个命令/指令组过滤器和第一个权限过滤器"""
+    command_filter = None
+    permission_filter = None
+    for event_filter in handler.event_filters:
+        if command_filter is None and isinstance(event_filter, (CommandFilter, CommandGroupFilter)):
+            command_filter = event_filter
+        elif permission_filter is None and isinstance(event_filter, PermissionTypeFilter):
+            permission_filter = event_filter
+    return command_filter, permission_filter
 
 
 class PermissionService:
     """权限管理服务类"""
     
     def __init__(self):
-        pass
+        # 命令列表缓存: (注册表指纹, {插件名: [...]})
+        self._cache: Optional[Tuple[tuple, Dict[str, List[tuple]]]] = None
+        # handler 索引: {(插件名, handler名): handler}，与命令列表缓存同时重建
+        self._handler_index: Dict[Tuple[str, str], StarHandlerMetadata] = {}
+        # 各 handler 的 (命令/指令组过滤器, 权限过滤器)，按 id(handler) 索引，构建缓存时一次遍历得到
+        self._handler_filters: Dict[int, Tuple[Any, Optional[PermissionTypeFilter]]] = {}
+        # 插件列表摘要: [{name, command_count, group_count, total_commands}, ...]，构建缓存时统计
+        self._plugin_summaries: List[Dict[str, Any]] = []
+        # 最近一次读取/写入的 alter_cmd 快照: (时间, 配置)
+        self._snapshot: Optional[Tuple[float, Dict[str, Any]]] = None
+        # 串行化 alter_cmd 的读-改-写，避免并发请求互相覆盖
+        self._cfg_lock = asyncio.Lock()
     
     def _get_all_commands_by_plugin(self) -> Dict[str, List[tuple]]:
         """
-        获取所有插件及其命令列表
+        获取所有插件及其命令列表（注册表指纹不变时直接返回缓存）
         返回: {插件名: [(handler, 命令名, 命令类型, 是否是指令组), ...]}
         """
+        fingerprint = registry_fingerprint()
+        if self._cache is not None and self._cache[0] == fingerprint:
+            return self._cache[1]
+        
         plugin_commands = {}
+        handler_index = {}
+        handler_filters = {}
         
         for handler in star_handlers_registry:
             assert isinstance(handler, StarHandlerMetadata)
@@ -33,38 +68,88 @@ class PermissionService:
             if plugin.name not in plugin_commands:
                 plugin_commands[plugin.name] = []
             
-            # 检查命令过滤器
-            for event_filter in handler.event_filters:
-                if isinstance(event_filter, CommandFilter):
-                    plugin_commands[plugin.name].append(
-                        (handler, event_filter.command_name, "command", False)
-                    )
-                    break
-                elif isinstance(event_filter, CommandGroupFilter):
-                    plugin_commands[plugin.name].append(
-                        (handler, event_filter.group_name, "command_group", True)
-                    )
-                    break
-        
-        return plugin_commands
-    
-    def get_all_plugins(self) -> List[Dict[str, Any]]:
-        """获取所有插件列表"""
-        plugin_commands = self._get_all_commands_by_plugin()
+            command_filter, permission_filter = _scan_handler_filters(handler)
+            
+            if isinstance(command_filter, CommandFilter):
+                plugin_commands[plugin.name].append(
+                    (handler, command_filter.command_name, "command", False)
+                )
+            elif command_filter is not None:
+                plugin_commands[plugin.name].append(
+                    (handler, command_filter.group_name, "command_group", True)
+                )
+            else:
+                continue
+            handler_index.setdefault((plugin.name, handler.handler_name), handler)
+            handler_filters[id(handler)] = (command_filter, permission_filter)
         
-        plugins = []
+        plugin_summaries = []
         for plugin_name, commands in plugin_commands.items():
-            command_count = len([c for c in commands if c[2] == "command"])
-            group_count = len([c for c in commands if c[3]])
-            
-            plugins.append({
+            group_count = sum(1 for command in commands if command[3])
+            plugin_summaries.append({
                 "name": plugin_name,
-                "command_count": command_count,
+                "command_count": len(commands) - group_count,
                 "group_count": group_count,
                 "total_commands": len(commands)
             })
         
-        return plugins
+        self._cache = (fingerprint, plugin_commands)
+        self._handler_index = handler_index
+        self._handler_filters = handler_filters
+        self._plugin_summaries = plugin_summaries
+        return plugin_commands
+    
+    async def _get_alter_cmd(self) -> Dict[str, Any]:
+        """读取 alter_cmd 配置，快照有效期内直接复用"""
+        now = asyncio.get_running_loop().time()
+        if self._snapshot is not None and now - self._snapshot[0] < ALTER_CMD_SNAPSHOT_TTL:
+            return self._snapshot[1]
+        alter_cmd_cfg = await sp.global_get("alter_cmd", {})
+        self._snapshot = (now, alter_cmd_cfg)
+        return alter_cmd_cfg
+    
+    async def _update_command_cfg(self, plugin_name: str, handler_names: List[str], key: str, value: Any):
+        """
+        将插件下指定命令配置的 key 设为 value，一次读取、一次写入
+        写入前总是重新读取 alter_cmd，不使用快照，避免覆盖命令行侧或 /alter_cmd 刚做的修改
+        """
+        async with self._cfg_lock:
+            alter_cmd_cfg = await sp.global_get("alter_cmd", {})
+            plugin_cfg = alter_cmd_cfg.get(plugin_name, {})
+            for handler_name in handler_names:
+                cmd_cfg = plugin_cfg.get(handler_name, {})
+                cmd_cfg[key] = value
+                plugin_cfg[handler_name] = cmd_cfg
+            alter_cmd_cfg[plugin_name] = plugin_cfg
+            await sp.global_put("alter_cmd", alter_cmd_cfg)
+            self._snapshot = (asyncio.get_running_loop().time(), alter_cmd_cfg)
+    
+    def _set_permission_filter(self, handler: StarHandlerMetadata, permission_type: PermissionType):
+        """
+        将 handler 的权限过滤器设为指定类型，直接使用缓存中记录的过滤器
+        缓存中没有权限过滤器时重新查找一次（可能已被命令行侧或应用配置时追加），仍没有则追加一个，并记录到缓存
+        调用方在 await 之后调用时缓存可能已因插件重载而重建、不再包含该 handler，此时同样直接查找
+        """
+        cached = self._handler_filters.get(id(handler))
+        command_filter, permission_filter = cached or (None, None)
+        if permission_filter is None:
+            command_filter, permission_filter = _scan_handler_filters(handler)
+        if permission_filter is None:
+            permission_filter = PermissionTypeFilter(permission_type)
+            handler.event_filters.append(permission_filter)
+        if cached is not None:
+            self._handler_filters[id(handler)] = (command_filter, permission_filter)
+        permission_filter.permission_type = permission_type
+    
+    def get_plugins_etag(self) -> str:
+        """插件列表的弱 ETag，取自命令列表缓存的注册表指纹，插件增删/启停或命令改名后随之改变，不随权限修改变化"""
+        self._get_all_commands_by_plugin()
+        return f'W/"{hash(self._cache[0]) & 0xFFFFFFFFFFFFFFFF:x}"'
+    
+    def get_all_plugins(self) -> List[Dict[str, Any]]:
+        """获取所有插件列表（摘要在构建命令列表缓存时统计，每次返回副本）"""
+        self._get_all_commands_by_plugin()
+        return [dict(summary) for summary in self._plugin_summaries]
     
     async def get_plugin_commands(self, plugin_name: str) -> Optional[Dict[str, Any]]:
         """获取指定插件的所有命令"""
@@ -74,44 +159,41 @@ class PermissionService:
             return None
         
         commands = plugin_commands[plugin_name]
-        alter_cmd_cfg = await sp.global_get("alter_cmd", {})
+        # 与命令列表同时取得过滤器索引：await 期间插件重载会重建缓存，新索引中没有这些 handler
+        handler_filters = self._handler_filters
+        alter_cmd_cfg = await self._get_alter_cmd()
         plugin_cfg = alter_cmd_cfg.get(plugin_name, {})
         
         command_list = []
         group_list = []
         
         for handler, cmd_name, cmd_type, is_group in commands:
-            current_perm = plugin_cfg.get(handler.handler_name, {}).get("permission", "未设置")
+            # 过滤器在构建缓存时已找出，之后由 _set_permission_filter 追加的权限过滤器也会记录到缓存
+            command_filter, permission_filter = handler_filters[id(handler)]
+            cmd_cfg = plugin_cfg.get(handler.handler_name) or _EMPTY_CMD_CFG
+            current_perm = cmd_cfg.get("permission", "未设置")
             if current_perm == "未设置":
                 # 检查handler中是否有权限过滤器
-                for event_filter in handler.event_filters:
-                    if isinstance(event_filter, PermissionTypeFilter):
-                        if event_filter.permission_type == PermissionType.ADMIN:
-                            current_perm = "admin"
-                        else:
-                            current_perm = "member"
-                        break
+                if permission_filter:
+                    if permission_filter.permission_type == PermissionType.ADMIN:
+                        current_perm = "admin"
+                    else:
+                        current_perm = "member"
             
             # 获取别名信息
-            cmd_cfg = plugin_cfg.get(handler.handler_name, {})
             # 检查配置中是否明确设置了别名（包括空列表）
             if "aliases" in cmd_cfg:
                 aliases = cmd_cfg.get("aliases", [])
             else:
                 # 如果配置中没有别名设置，尝试从过滤器中获取
-                aliases = []
-                for event_filter in handler.event_filters:
-                    if isinstance(event_filter, (CommandFilter, CommandGroupFilter)):
-                        if event_filter.alias:
-                            aliases = list(event_filter.alias)
-                        break
+                aliases = list(command_filter.alias) if command_filter.alias else []
             
             # 确保 aliases 是列表类型
             if not isinstance(aliases, list):
                 aliases = list(aliases) if aliases else []
             
             # 获取命令名（可能被修改过）
-            display_name = plugin_cfg.get(handler.handler_name, {}).get("name", cmd_name)
+            display_name = cmd_cfg.get("name", cmd_name)
             
             info = {
                 "name": display_name,
@@ -143,41 +225,22 @@ class PermissionService:
         if permission not in ["admin", "member"]:
             return {"success": False, "message": "权限类型错误，只能是 admin 或 member"}
         
-        # 更新配置
-        alter_cmd_cfg = await sp.global_get("alter_cmd", {})
-        plugin_cfg = alter_cmd_cfg.get(plugin_name, {})
+        commands = plugin_commands[plugin_name]
         
-        success_count = 0
-        total_count = 0
+        # 更新配置（一次读取、一次写入）
+        await self._update_command_cfg(
+            plugin_name,
+            [handler.handler_name for handler, _, _, _ in commands],
+            "permission",
+            permission
+        )
         
-        for handler, cmd_name, cmd_type, is_group in plugin_commands[plugin_name]:
-            total_count += 1
-            cmd_cfg = plugin_cfg.get(handler.handler_name, {})
-            cmd_cfg["permission"] = permission
-            plugin_cfg[handler.handler_name] = cmd_cfg
-            
-            # 更新handler中的权限过滤器
-            found_permission_filter = False
-            for event_filter in handler.event_filters:
-                if isinstance(event_filter, PermissionTypeFilter):
-                    if permission == "admin":
-                        event_filter.permission_type = PermissionType.ADMIN
-                    else:
-                        event_filter.permission_type = PermissionType.MEMBER
-                    found_permission_filter = True
-                    break
-            
-            if not found_permission_filter:
-                handler.event_filters.append(
-                    PermissionTypeFilter(
-                        PermissionType.ADMIN if permission == "admin" else PermissionType.MEMBER
-                    )
-                )
-            
-            success_count += 1
+        # 更新handler中的权限过滤器
+        permission_type = PermissionType.ADMIN if permission == "admin" else PermissionType.MEMBER
+        for handler, _, _, _ in commands:
+            self._set_permission_filter(handler, permission_type)
         
-        alter_cmd_cfg[plugin_name] = plugin_cfg
-        await sp.global_put("alter_cmd", alter_cmd_cfg)
+        success_count = total_count = len(commands)
         
         return {
             "success": True,
@@ -196,41 +259,19 @@ class PermissionService:
             return {"success": False, "message": "权限类型错误，只能是 admin 或 member"}
         
         # 查找handler
-        found_handler = None
-        for handler, cmd_name, cmd_type, is_group in plugin_commands[plugin_name]:
-            if handler.handler_name == handler_name:
-                found_handler = handler
-                break
+        found_handler = self._handler_index.get((plugin_name, handler_name))
         
         if not found_handler:
             return {"success": False, "message": f"未找到命令处理器: {handler_name}"}
         
         # 更新配置
-        alter_cmd_cfg = await sp.global_get("alter_cmd", {})
-        plugin_cfg = alter_cmd_cfg.get(plugin_name, {})
-        cmd_cfg = plugin_cfg.get(handler_name, {})
-        cmd_cfg["permission"] = permission
-        plugin_cfg[handler_name] = cmd_cfg
-        alter_cmd_cfg[plugin_name] = plugin_cfg
-        await sp.global_put("alter_cmd", alter_cmd_cfg)
+        await self._update_command_cfg(plugin_name, [handler_name], "permission", permission)
         
         # 更新handler中的权限过滤器
-        found_permission_filter = False
-        for event_filter in found_handler.event_filters:
-            if isinstance(event_filter, PermissionTypeFilter):
-                if permission == "admin":
-                    event_filter.permission_type = PermissionType.ADMIN
-                else:
-                    event_filter.permission_type = PermissionType.MEMBER
-                found_permission_filter = True
-                break
-        
-        if not found_permission_filter:
-            found_handler.event_filters.append(
-                PermissionTypeFilter(
-                    PermissionType.ADMIN if permission == "admin" else PermissionType.MEMBER
-                )
-            )
+        self._set_permission_filter(
+            found_handler,
+            PermissionType.ADMIN if permission == "admin" else PermissionType.MEMBER
+        )
         
         return {"success": True, "message": "权限设置成功"}
     
@@ -241,23 +282,13 @@ class PermissionService:
             return {"success": False, "message": f"未找到插件: {plugin_name}"}
         
         # 查找handler
-        found_handler = None
-        for handler, cmd_name, cmd_type, is_group in plugin_commands[plugin_name]:
-            if handler.handler_name == handler_name:
-                found_handler = handler
-                break
+        found_handler = self._handler_index.get((plugin_name, handler_name))
         
         if not found_handler:
             return {"success": False, "message": f"未找到命令处理器: {handler_name}"}
         
         # 更新配置
-        alter_cmd_cfg = await sp.global_get("alter_cmd", {})
-        plugin_cfg = alter_cmd_cfg.get(plugin_name, {})
-        cmd_cfg = plugin_cfg.get(handler_name, {})
-        cmd_cfg["name"] = new_name
-        plugin_cfg[handler_name] = cmd_cfg
-        alter_cmd_cfg[plugin_name] = plugin_cfg
-        await sp.global_put("alter_cmd", alter_cmd_cfg)
+        await self._update_command_cfg(plugin_name, [handler_name], "name", new_name)
         
         # 更新handler中的过滤器
         for event_filter in found_handler.event_filters:
@@ -270,6 +301,9 @@ class PermissionService:
                 event_filter._cmpl_cmd_names = None
                 break
         
+        # 命令名变更，使命令行侧的命令列表缓存失效
+        touch_registry()
+        
         return {"success": True, "message": f"成功将命令名修改为 {new_name}"}
     
     async def set_command_aliases(self, plugin_name: str, handler_name: str, aliases: List[str]) -> Dict[str, Any]:
@@ -283,35 +317,30 @@ class PermissionService:
             aliases = list(aliases) if aliases else []
         
         # 查找handler
-        found_handler = None
-        for handler, cmd_name, cmd_type, is_group in plugin_commands[plugin_name]:
-            if handler.handler_name == handler_name:
-                found_handler = handler
-                break
+        found_handler = self._handler_index.get((plugin_name, handler_name))
         
         if not found_handler:
             return {"success": False, "message": f"未找到命令处理器: {handler_name}"}
         
-        # 更新配置
-        alter_cmd_cfg = await sp.global_get("alter_cmd", {})
-        plugin_cfg = alter_cmd_cfg.get(plugin_name, {})
-        cmd_cfg = plugin_cfg.get(handler_name, {})
-        # 确保保存的是列表，即使是空列表也要保存
-        cmd_cfg["aliases"] = aliases if aliases else []
-        plugin_cfg[handler_name] = cmd_cfg
-        alter_cmd_cfg[plugin_name] = plugin_cfg
-        await sp.global_put("alter_cmd", alter_cmd_cfg)
-        
-        # 更新handler中的过滤器
-        for event_filter in found_handler.event_filters:
-            if isinstance(event_filter, CommandFilter):
-                event_filter.alias = set(aliases) if aliases else set()
-                event_filter._cmpl_cmd_names = None
-                break
-            elif isinstance(event_filter, CommandGroupFilter):
-                event_filter.alias = set(aliases) if aliases else set()
-                event_filter._cmpl_cmd_names = None
-                break
+        # 过滤器当前的别名和配置中保存的别名列表（含顺序）都与请求相同时不写配置，
+        # 也不清除 AstrBot 的完整命令名缓存；只调整顺序仍会写入配置
+        # （过滤器在 await 之前取得，之后缓存被重建也不影响）
+        command_filter = self._handler_filters[id(found_handler)][0]
+        alias_set = set(aliases)
+        if alias_set == command_filter.alias:
+            alter_cmd_cfg = await sp.global_get("alter_cmd", {})
+            stored_aliases = alter_cmd_cfg.get(plugin_name, {}).get(handler_name, {}).get("aliases")
+            if stored_aliases == aliases:
+                return {"success": True, "message": "别名未变更"}
+        
+        # 更新配置，确保保存的是列表，即使是空列表也要保存
+        await self._update_command_cfg(plugin_name, [handler_name], "aliases", aliases if aliases else [])
+        
+        # 更新handler中的过滤器（换成新集合而不原地修改：原集合可能与插件代码中的常量共用），
+        # 只调整顺序时过滤器不变
+        if alias_set != command_filter.alias:
+            command_filter.alias = alias_set
+            command_filter._cmpl_cmd_names = None
         
         return {"success": True, "message": f"成功设置别名: {', '.join(aliases) if aliases else '无'}"}
 
@@ -0,0 +1,34 @@
+"""命令行与 Web UI 共用的 handler 注册表状态：缓存指纹、命令改名计数和 alter_cmd 快照有效期"""
+from typing import Tuple
+
+from astrbot.core.star.star_handler import star_handlers_registry
+from astrbot.core.star.star import star_map
+
+
+# alter_cmd 读取快照的有效期（秒）：合并连续命令和页面渲染中的重复读取，
+# 同时能及时看到另一侧或 AstrBot 自身 /alter_cmd 的修改
+ALTER_CMD_SNAPSHOT_TTL = 2
+
+# 命令改名计数，由 touch_registry 递增；放在模块中而不挂到注册表上，注册表不支持实例属性时也可用
+_revision = 0
+
+
+def registry_fingerprint() -> Tuple[int, int, int, int]:
+    """
+    计算 handler 注册表的指纹，用于判断命令列表缓存是否失效
+    覆盖 handler 的增删/重载、插件启停，以及通过 touch_registry 登记的命令改名
+    注册表已被挂钩时（_perm_manager_version）用其变更计数代替逐个 handler 计算的哈希
+    """
+    version = getattr(star_handlers_registry, "_perm_manager_version", None)
+    return (
+        len(star_handlers_registry),
+        hash(tuple(map(id, star_handlers_registry))) if version is None else version,
+        hash(tuple(path for path, plugin in star_map.items() if plugin.activated)),
+        _revision,
+    )
+
+
+def touch_registry():
+    """登记一次命令名变更，使所有基于注册表指纹的缓存失效（命令行与 Web UI 共享）"""
+    global _revision
+    _revision += 1
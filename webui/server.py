@@ -9,6 +9,28 @@ from astrbot.api import logger
 ASGIAppFactory = Callable[[], Any]
 
 
+class _NotifyingServer(uvicorn.Server):
+    """
+    启动结束（成功监听或失败）后设置 startup_done 的 uvicorn.Server，避免轮询 started 标志
+    uvicorn 在端口绑定或 lifespan 启动失败时调用 sys.exit，这里记录为 startup_error，
+    不让 SystemExit 传出事件循环
+    """
+
+    def __init__(self, config: uvicorn.Config) -> None:
+        super().__init__(config)
+        self.startup_done = asyncio.Event()
+        self.startup_error: BaseException | None = None
+
+    async def startup(self, sockets: Any = None) -> None:
+        try:
+            await super().startup(sockets=sockets)
+        except SystemExit as exc:
+            self.startup_error = exc
+            self.should_exit = True
+        finally:
+            self.startup_done.set()
+
+
 class WebUIServer:
     """
     权限管理 WebUI 服务包装器
@@ -27,8 +49,10 @@ class WebUIServer:
         self._app_factory = app_factory
         self._startup_path = startup_path
 
-        self._app: Any = None
-        self._server: uvicorn.Server | None = None
+        # uvicorn 配置（含已加载的 ASGI 应用）在首次启动时创建，之后的启动/停止循环中复用；
+        # uvicorn.Server 的状态不能重置，每次启动仍新建
+        self._config: uvicorn.Config | None = None
+        self._server: _NotifyingServer | None = None
         self._server_task: asyncio.Task | None = None
 
     async def start(self) -> None:
@@ -37,35 +61,48 @@ class WebUIServer:
             logger.warning("PermissionManager WebUI 服务已在运行中")
             return
 
-        self._app = self._app_factory()
-
-        config = uvicorn.Config(
-            app=self._app,
-            host=self.host,
-            port=self.port,
-            log_level="info",
-            loop="asyncio",
-            lifespan="on",
-        )
-        self._server = uvicorn.Server(config)
+        if self._config is None:
+            self._config = uvicorn.Config(
+                app=self._app_factory(),
+                host=self.host,
+                port=self.port,
+                log_level="info",
+                loop="asyncio",
+                lifespan="on",
+            )
+        self._server = _NotifyingServer(self._config)
         self._server_task = asyncio.create_task(self._server.serve())
 
-        # 等待服务启动
-        for _ in range(50):
-            if getattr(self._server, "started", False):
-                logger.info(
-                    "PermissionManager WebUI 已启动: http://%s:%s%s",
-                    self._display_host,
-                    self.port,
-                    self._startup_path,
-                )
-                return
+        # 等待启动结束（开始监听或失败），最多 5 秒
+        startup_done = asyncio.create_task(self._server.startup_done.wait())
+        try:
+            await asyncio.wait(
+                {startup_done, self._server_task},
+                timeout=5,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+        finally:
+            startup_done.cancel()
+
+        if self._server.started:
+            logger.info(
+                "PermissionManager WebUI 已启动: http://%s:%s%s",
+                self._display_host,
+                self.port,
+                self._startup_path,
+            )
+            return
 
-            if self._server_task.done():
-                error = self._server_task.exception()
-                raise RuntimeError(f"WebUI 启动失败: {error}") from error
+        if self._server.startup_error is not None:
+            # 具体原因（如端口被占用）已由 uvicorn 记录到日志
+            await self._server_task
+            self._server_task = None
+            self._server = None
+            raise RuntimeError("WebUI 启动失败，请查看 uvicorn 日志（端口可能被占用）")
 
-            await asyncio.sleep(0.1)
+        if self._server_task.done():
+            error = self._server_task.exception()
+            raise RuntimeError(f"WebUI 启动失败: {error}") from error
 
         logger.warning("PermissionManager WebUI 启动耗时较长，仍在后台启动中")
 
@@ -75,17 +112,17 @@ class WebUIServer:
             logger.info("PermissionManager WebUI 服务未运行，无需停止")
             return
 
+        # 只通知 uvicorn 退出并等待 serve() 自然结束，不取消任务，
+        # 避免 CancelledError 打断 uvicorn 的关闭流程；serve() 出错时也同样清理状态
         if self._server:
             self._server.should_exit = True
 
-        if self._server_task:
-            try:
+        try:
+            if self._server_task:
                 await self._server_task
-            finally:
-                self._server_task = None
-
-        self._server = None
-        self._app = None
+        finally:
+            self._server_task = None
+            self._server = None
         logger.info("PermissionManager WebUI 已停止")
 
     @property